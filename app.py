@@ -1,8 +1,14 @@
 import sys
-from PySide6.QtWidgets import QApplication
-from gui.main_window import MainWindow
 
 def main():
+    # The console runner must not pull in Qt.
+    if len(sys.argv) > 1 and sys.argv[1] == "--script":
+        from core.apdu_script import main as script_main
+        sys.exit(script_main(sys.argv[2:]))
+
+    from PySide6.QtWidgets import QApplication
+    from gui.main_window import MainWindow
+
     app = QApplication(sys.argv)
     win = MainWindow()
     win.show()
@@ -10,4 +16,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
@@ -1,71 +1,144 @@
+import os
+
 from core.language_manager import tr
 from drivers.sle4442 import SLE4442
 from drivers.sle4428 import SLE4428
 from drivers.sle5528 import SLE5528
 from drivers.pin_obtain import PinObtain
-from core.atr_detector import ATRDetector, CardType
+from core.card_session import CardSession
+from core.atr_detector import ATRDetector
+from core.apdu_recorder import RecordingConnection, new_transcript_path
+from core.reader_caps import ReaderCapsCache
+from drivers.reader_profiles import select_profile
+from drivers.base_card import HEADER_LENGTH
+
+# Cards at least this large are read page by page on demand when the
+# lazy_read setting is on; smaller ones cost one or two APDUs in full.
+LAZY_READ_MIN_SIZE = 1024
 
 class AppController:
-    def __init__(self, pcsc, settings, logger):
+    def __init__(self, pcsc, settings, logger, reader_caps=None):
         self.pcsc = pcsc
         self.settings = settings
         self.log = logger
         self.main = None
-        self.conn = None
-        self.connected_reader = None
-        self.card = None
+        self.session = None
         self.memory = None
-        self.card_type = None
+        self.on_progress = None
+        self.on_chunk = None
+        self.log_sink = None
+        self.apdu_stats = None
+        self.reader_caps = reader_caps
+        if reader_caps is None and settings is not None:
+            self.reader_caps = ReaderCapsCache(
+                os.path.join(os.path.dirname(settings.path), "reader_caps.json")
+            )
+
+    @property
+    def conn(self):
+        return self.session.conn if self.session else None
+
+    @property
+    def connected_reader(self):
+        return self.session.reader if self.session else None
+
+    @property
+    def card(self):
+        return self.session.card if self.session else None
+
+    @card.setter
+    def card(self, card):
+        if self.session is None:
+            return
+        if card is None:
+            self.session.card = None
+        else:
+            self.session.attach(card)
+
+    @property
+    def card_type(self):
+        return self.session.card_type if self.session else None
+
+    @card_type.setter
+    def card_type(self, value):
+        if self.session is not None:
+            self.session.card_type = value
 
     def list_readers(self):
         return self.pcsc.list_readers()
 
     def connect_reader(self, reader):
+        session = self.session
+        if session is None or str(session.reader) != str(reader):
+            self.disconnect_reader()
+            session = CardSession(
+                reader,
+                logger=lambda msg: self.log(msg),
+                wrap=self._wrap_connection,
+            )
+        else:
+            session.close()
+
         try:
-            conn = reader.createConnection()
-            conn.connect()
-            self.conn = conn
-            self.connected_reader = reader
-            atr = conn.getATR()
-            return atr
+            atr = session.open()
         except Exception as exc:
-            self.conn = None
-            self.connected_reader = None
+            self.session = None
             raise exc
 
+        self.session = session
+        return atr
+
+    def _wrap_connection(self, conn, reader):
+        if self.settings and self.settings.get("record_apdu", False):
+            return self._start_recording(conn, reader)
+        return conn
+
+    def _start_recording(self, conn, reader):
+        folder = os.path.join(os.path.dirname(self.settings.path), "transcripts")
+        path = new_transcript_path(folder, reader)
+        self.log(f"{tr('log.recording_apdu')}: {path}")
+        return RecordingConnection(conn, path)
+
+    def recover_connection(self) -> bool:
+        if not self.session:
+            raise Exception(tr("error.no_connection"))
+        same_card = self.session.recover()
+        if not same_card:
+            self.memory = None
+        return same_card
+
+    def invalidate_card(self):
+        if self.session:
+            self.session.invalidate()
+            self.session.close()
+        self.memory = None
+
     def disconnect_reader(self):
-        if self.conn:
-            try:
-                self.conn.disconnect()
-            except Exception:
-                pass
-        self.conn = None
-        self.connected_reader = None
-        self.card = None
+        if self.session:
+            self.session.close()
+        self.session = None
         self.memory = None
-        self.card_type = None
 
     def detect_card_type(self) -> str:
-        if self.card_type is not None:
-            return self.card_type
-        if not self.conn:
+        if not self.session or not self.conn:
             raise Exception(tr("error.no_connection"))
-        atr = self.conn.getATR()
-        ctype = ATRDetector.detect(atr, self.conn, logger=self.log)
-        if ctype == CardType.SLE4442:
-            self.card_type = "SLE4442"
-        elif ctype == CardType.SLE5542:
-            self.card_type = "SLE5542"
-        elif ctype == CardType.SLE4428:
-            self.card_type = "SLE4428"
-        elif ctype == CardType.SLE5528:
-            self.card_type = "SLE5528"
-        else:
-            self.log(tr("msg.fallback_4442"))
-            self.card_type = "SLE4442"
-        return self.card_type
+        if self.session.card_type is not None:
+            return self.session.card_type
 
-    def load_card(self, card_type: str):
+        caps = {}
+        if self.reader_caps is not None and self.connected_reader is not None:
+            caps = self.reader_caps.get(str(self.connected_reader), self.conn.getATR())
+        if caps.get("card_type"):
+            ATRDetector.remember(self.conn.getATR(), caps["card_type"])
+
+        ctype = self.session.detect_card_type(self.reader_profile())
+        # Only a real detection is kept, never the SLE4442 fallback.
+        known = ATRDetector.known(self.conn.getATR())
+        if self.reader_caps is not None and self.connected_reader is not None and known and known != caps.get("card_type"):
+            self.reader_caps.update(str(self.connected_reader), self.conn.getATR(), card_type=known)
+        return ctype
+
+    def create_card(self, card_type: str):
         if not self.conn:
             raise Exception("No active reader connection.")
         driver_cls = {
@@ -76,8 +149,31 @@ class AppController:
         }.get(card_type)
         if not driver_cls:
             raise Exception(tr("error.unsupported_card_type") + f": {card_type}")
-        self.card = driver_cls(conn=self.conn, logger=self.log)
-        self.memory = self.card.read_all()
+        if type(self.card) is not driver_cls:
+            card = driver_cls(conn=self.conn, logger=self.log)
+            card.set_profile(self.reader_profile())
+            self.card = card
+            self._apply_reader_caps(self.card)
+        self.card.verify_writes = bool(self.settings.get("verify_writes", False)) if self.settings else False
+        self.card.consensus_reads = int(self.settings.get("consensus_reads", 1)) if self.settings else 1
+        self.card.on_progress = self.on_progress
+        self.card.on_chunk = self.on_chunk
+        self.card.sink = self.log_sink
+        self.card.stats = self.apdu_stats
+        return self.card
+
+    def load_card(self, card_type: str):
+        self.create_card(card_type)
+        if self.lazy_read():
+            # Header plus neighbouring pages; the editor asks for the rest.
+            self.card.begin_lazy()
+            self.card.ensure_pages(0, HEADER_LENGTH - 1)
+            self.memory = list(self.card.main_memory)
+        else:
+            self.memory = self.card.read_all()
+        if self.card.unstable:
+            ranges = ", ".join(f"{a:04X}+{n}" for a, n in sorted(self.card.unstable.items()))
+            self.log(f"{tr('log.read_unstable_summary')}: {ranges}")
         try:
             sm = self.card.read_security_memory()
             chv = sm[0]
@@ -85,10 +181,33 @@ class AppController:
                 self.card.is_authenticated = True
             else:
                 self.card.is_authenticated = False
+                self.card.auth_psc = None
         except Exception:
             pass
         return self.memory
 
+    def lazy_read(self) -> bool:
+        if not self.settings or not self.settings.get("lazy_read", False):
+            return False
+        return self.card is not None and self.card.size >= LAZY_READ_MIN_SIZE
+
+    def complete_dump(self):
+        self.memory = self.card.complete_image()
+        return self.memory
+
+    def reader_profile(self):
+        override = self.settings.get("reader_profile", "auto") if self.settings else "auto"
+        return select_profile(self.connected_reader, self.conn.getATR(), override)
+
+    def _apply_reader_caps(self, card):
+        if self.reader_caps is None or self.connected_reader is None:
+            return
+        reader = str(self.connected_reader)
+        atr = self.conn.getATR()
+        caps = self.reader_caps.get(reader, atr)
+        card.set_chunk_sizes(caps.get("read_chunk"), caps.get("write_chunk"))
+        card.on_caps_changed = lambda c: self.reader_caps.update(reader, atr, **c.persistent_caps())
+
     def obtain_psc(self):
         if not self.card:
             raise Exception(tr('error.no_card_loaded'))
@@ -134,4 +253,11 @@ class AppController:
     def export_memory(self) -> bytes:
         if self.memory is None:
             raise Exception(tr("error.no_memory_export"))
+        card = self.card
+        if card is not None and (card.memory_loaded or card.loaded_pages):
+            # self.memory is a snapshot; pages read later and confirmed
+            # writes only land in the driver image.
+            if not card.memory_loaded:
+                raise Exception(tr("error.export_partial_image"))
+            return bytes(card.main_memory)
         return bytes(self.memory)
@@ -0,0 +1,127 @@
+import threading
+from collections import deque
+
+from core.language_manager import tr
+
+
+DEBUG = 10
+INFO = 20
+ERROR = 40
+
+LEVELS = {"debug": DEBUG, "info": INFO, "error": ERROR}
+
+SEND = "send"
+RECV = "recv"
+FAIL = "fail"
+
+
+def hex_bytes(arr) -> str:
+    return " ".join(f"{b:02X}" for b in arr)
+
+
+def render_desc(desc) -> str:
+    if isinstance(desc, tuple):
+        key, *args = desc
+        if not args:
+            return tr(key)
+        return f"{tr(key)}[{':'.join(str(a) for a in args)}]"
+    return desc
+
+
+class ApduEvent:
+    """
+    One APDU exchange step. Only raw values are stored; hex dumps and
+    translated labels are produced by render() when someone displays it.
+    """
+
+    __slots__ = ("direction", "apdu", "data", "sw1", "sw2", "duration", "desc", "level")
+
+    def __init__(self, direction, apdu, data=None, sw1=0, sw2=0, duration=0.0, desc="", level=DEBUG):
+        self.direction = direction
+        self.apdu = apdu
+        self.data = data
+        self.sw1 = sw1
+        self.sw2 = sw2
+        self.duration = duration
+        self.desc = desc
+        self.level = level
+
+    @property
+    def ins(self) -> int:
+        return self.apdu[1] if len(self.apdu) > 1 else 0
+
+    @property
+    def address(self) -> int:
+        if len(self.apdu) < 4:
+            return 0
+        return (self.apdu[2] << 8) | self.apdu[3]
+
+    @property
+    def length(self) -> int:
+        return self.apdu[4] if len(self.apdu) > 4 else 0
+
+    @property
+    def sw(self) -> int:
+        return (self.sw1 << 8) | self.sw2
+
+    def render(self) -> str:
+        if self.direction == SEND:
+            return f"<< {tr('log.apdu_send')} ({render_desc(self.desc)}): {hex_bytes(self.apdu)}"
+        if self.direction == FAIL:
+            return f">> {tr('log.sw_error')} SW={self.sw1:02X}{self.sw2:02X} in {render_desc(self.desc)}"
+        if self.data:
+            return f">> {tr('log.apdu_recv')} DATA: {hex_bytes(self.data)}"
+        return f">> {tr('log.sw_ok')}"
+
+    def __str__(self):
+        return self.render()
+
+
+class LogBuffer:
+    """
+    Thread-safe queue between the card threads and the GUI. notify is
+    called once when the buffer goes from empty to non-empty, so a burst
+    of events costs a single cross-thread wake-up.
+    """
+
+    def __init__(self, notify=None, maxlen: int = 20000):
+        self.notify = notify
+        self._items = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+        self._signalled = False
+
+    def push(self, item):
+        with self._lock:
+            self._items.append(item)
+            if self._signalled:
+                return
+            self._signalled = True
+        if self.notify:
+            self.notify()
+
+    def drain(self) -> list:
+        with self._lock:
+            items = list(self._items)
+            self._items.clear()
+            self._signalled = False
+        return items
+
+
+class ApduLogSink:
+
+    def __init__(self, target, level: int = DEBUG):
+        self.target = target
+        self.level = level
+
+    def enabled(self, level: int) -> bool:
+        return level >= self.level
+
+    def event(self, event: ApduEvent):
+        if event.level >= self.level:
+            self.target(event)
+
+    def text(self, msg: str, level: int = INFO):
+        if level >= self.level:
+            self.target(msg)
+
+    __call__ = text
@@ -0,0 +1,251 @@
+import os
+import struct
+import time
+
+try:
+    from smartcard.Exceptions import CardConnectionException
+except ImportError:
+    class CardConnectionException(Exception):
+        pass
+
+
+MAGIC = b"SLEAPDU1"
+TRANSCRIPT_EXT = ".sler"
+
+REC_ATR = 0x01
+REC_TX = 0x02
+REC_ERROR = 0x03
+
+_HEAD = struct.Struct("<Bd")
+_LEN = struct.Struct("<H")
+_TX = struct.Struct("<dHHBB")
+_ERROR = struct.Struct("<dH")
+
+
+class ApduRecord:
+    __slots__ = ("kind", "t", "duration", "command", "response", "sw1", "sw2", "message")
+
+    def __init__(self, kind, t, duration=0.0, command=b"", response=b"", sw1=0, sw2=0, message=""):
+        self.kind = kind
+        self.t = t
+        self.duration = duration
+        self.command = command
+        self.response = response
+        self.sw1 = sw1
+        self.sw2 = sw2
+        self.message = message
+
+    def __repr__(self):
+        if self.kind == REC_ATR:
+            return f"ATR @{self.t:.6f}: {self.response.hex(' ').upper()}"
+        if self.kind == REC_ERROR:
+            return f"ERR @{self.t:.6f} ({self.duration * 1000:.2f} ms): {self.command.hex(' ').upper()} -> {self.message}"
+        return (
+            f"TX  @{self.t:.6f} ({self.duration * 1000:.2f} ms): {self.command.hex(' ').upper()} -> "
+            f"{self.response.hex(' ').upper()} SW={self.sw1:02X}{self.sw2:02X}"
+        )
+
+
+def new_transcript_path(folder: str, reader=None) -> str:
+    os.makedirs(folder, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    name = "".join(c if c.isalnum() else "_" for c in str(reader or "card"))[:40]
+    return os.path.join(folder, f"{stamp}_{name}{TRANSCRIPT_EXT}")
+
+
+def read_transcript(path: str) -> list[ApduRecord]:
+    with open(path, "rb") as fh:
+        raw = fh.read()
+
+    if raw[: len(MAGIC)] != MAGIC:
+        raise ValueError(f"Not an APDU transcript: {path}")
+
+    records = []
+    pos = len(MAGIC)
+    end = len(raw)
+
+    while pos + _HEAD.size <= end:
+        kind, t = _HEAD.unpack_from(raw, pos)
+        pos += _HEAD.size
+
+        if kind == REC_ATR:
+            (ln,) = _LEN.unpack_from(raw, pos)
+            pos += _LEN.size
+            records.append(ApduRecord(kind, t, response=raw[pos:pos + ln]))
+            pos += ln
+        elif kind == REC_TX:
+            duration, c_ln, r_ln, sw1, sw2 = _TX.unpack_from(raw, pos)
+            pos += _TX.size
+            cmd = raw[pos:pos + c_ln]
+            pos += c_ln
+            resp = raw[pos:pos + r_ln]
+            pos += r_ln
+            records.append(ApduRecord(kind, t, duration, cmd, resp, sw1, sw2))
+        elif kind == REC_ERROR:
+            duration, c_ln = _ERROR.unpack_from(raw, pos)
+            pos += _ERROR.size
+            cmd = raw[pos:pos + c_ln]
+            pos += c_ln
+            (m_ln,) = _LEN.unpack_from(raw, pos)
+            pos += _LEN.size
+            msg = raw[pos:pos + m_ln].decode("utf-8", "replace")
+            pos += m_ln
+            records.append(ApduRecord(kind, t, duration, cmd, message=msg))
+        else:
+            raise ValueError(f"Corrupted transcript at offset {pos - _HEAD.size}: {path}")
+
+    return records
+
+
+class RecordingConnection:
+    """
+    Wraps a pyscard-like connection and appends every ATR, APDU exchange
+    and transmit failure to a binary transcript. Everything else is
+    delegated to the wrapped connection.
+    """
+
+    def __init__(self, conn, path: str):
+        self.conn = conn
+        self.path = path
+        self._fh = open(path, "wb")
+        self._fh.write(MAGIC)
+        self._fh.flush()
+        self._t0 = time.perf_counter()
+        self._last_atr = None
+        self.count = 0
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+    def _now(self) -> float:
+        return time.perf_counter() - self._t0
+
+    def _write(self, *chunks):
+        if self._fh is None:
+            return
+        self._fh.write(b"".join(chunks))
+        self._fh.flush()
+
+    def getATR(self):
+        atr = self.conn.getATR()
+        if atr != self._last_atr:
+            self._last_atr = list(atr)
+            data = bytes(atr)
+            self._write(_HEAD.pack(REC_ATR, self._now()), _LEN.pack(len(data)), data)
+        return atr
+
+    def transmit(self, apdu, *args, **kwargs):
+        cmd = bytes(apdu)
+        t = self._now()
+        start = time.perf_counter()
+        try:
+            data, sw1, sw2 = self.conn.transmit(apdu, *args, **kwargs)
+        except Exception as exc:
+            duration = time.perf_counter() - start
+            msg = str(exc).encode("utf-8")[:0xFFFF]
+            self._write(
+                _HEAD.pack(REC_ERROR, t),
+                _ERROR.pack(duration, len(cmd)),
+                cmd,
+                _LEN.pack(len(msg)),
+                msg,
+            )
+            raise
+
+        duration = time.perf_counter() - start
+        resp = bytes(data)
+        self._write(
+            _HEAD.pack(REC_TX, t),
+            _TX.pack(duration, len(cmd), len(resp), sw1, sw2),
+            cmd,
+            resp,
+        )
+        self.count += 1
+        return data, sw1, sw2
+
+    def close(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    def disconnect(self):
+        try:
+            self.conn.disconnect()
+        finally:
+            self.close()
+
+
+class ReplayConnection:
+    """
+    Serves a recorded transcript back in order. With speed=0 responses are
+    returned immediately, otherwise each exchange lasts its recorded
+    duration divided by speed. In strict mode a command that differs from
+    the recorded one raises instead of silently desynchronising.
+    """
+
+    def __init__(self, path: str, speed: float = 0.0, strict: bool = True, reader_name: str = None):
+        self.path = path
+        self.speed = speed
+        self.strict = strict
+        self.reader_name = reader_name or os.path.basename(path)
+        self.records = read_transcript(path)
+        self._exchanges = [r for r in self.records if r.kind != REC_ATR]
+        self._pos = 0
+
+        atrs = [r for r in self.records if r.kind == REC_ATR]
+        self.atr = list(atrs[0].response) if atrs else []
+
+    def connect(self, *args, **kwargs):
+        pass
+
+    def disconnect(self):
+        pass
+
+    def getATR(self):
+        return list(self.atr)
+
+    def getReader(self):
+        return self.reader_name
+
+    def rewind(self):
+        self._pos = 0
+
+    @property
+    def remaining(self) -> int:
+        return len(self._exchanges) - self._pos
+
+    def transmit(self, apdu, *args, **kwargs):
+        if self._pos >= len(self._exchanges):
+            raise CardConnectionException(f"Replay exhausted after {self._pos} APDUs")
+
+        rec = self._exchanges[self._pos]
+        cmd = bytes(apdu)
+        if self.strict and cmd != rec.command:
+            raise CardConnectionException(
+                f"Replay mismatch at APDU #{self._pos}: sent {cmd.hex(' ').upper()}, "
+                f"recorded {rec.command.hex(' ').upper()}"
+            )
+        self._pos += 1
+
+        if self.speed > 0 and rec.duration > 0:
+            time.sleep(rec.duration / self.speed)
+
+        if rec.kind == REC_ERROR:
+            raise CardConnectionException(rec.message)
+
+        return list(rec.response), rec.sw1, rec.sw2
+
+
+class ReplayReader:
+
+    def __init__(self, path: str, speed: float = 0.0, strict: bool = True):
+        self.path = path
+        self.speed = speed
+        self.strict = strict
+        self.name = f"Replay: {os.path.basename(path)}"
+
+    def createConnection(self):
+        return ReplayConnection(self.path, speed=self.speed, strict=self.strict, reader_name=self.name)
+
+    def __str__(self):
+        return self.name
@@ -0,0 +1,311 @@
+"""
+Console runner for raw APDU scripts.
+
+    # comment
+    let ADDR = 0040
+    let DATA = 01 02 03 04
+    FF B0 ${ADDR} 10                   => 9000
+    FF D0 ${ADDR} ${#DATA} ${DATA}     => 90XX
+    repeat 20 FF B0 00 00 FF
+    for ADDR = 0000..00F0 step 10
+        FF B0 ${ADDR} 10
+    end
+
+Every APDU goes through BaseCard.tx. `=> SW` sets the expected status
+word (X is a wildcard nibble, default 90XX); `${#NAME}` expands to the
+length of NAME as one byte. Loop variables are two bytes, big endian.
+"""
+
+import argparse
+import re
+import sys
+import time
+
+from core.language_manager import tr, init_language
+from core.apdu_log import ApduLogSink, hex_bytes, DEBUG, ERROR
+from drivers.base_card import ApduError
+
+
+_VAR = re.compile(r"^\$\{(#?)([A-Za-z_][A-Za-z0-9_]*)\}$")
+_SW = re.compile(r"^[0-9A-Fa-fXx]{4}$")
+_COMMENT = re.compile(r"(?<!\{)#.*$")
+
+
+class ScriptError(Exception):
+
+    def __init__(self, lineno: int, msg: str):
+        super().__init__(f"line {lineno}: {msg}")
+        self.lineno = lineno
+
+
+def _hex_tokens(tokens, lineno) -> list[int]:
+    out = []
+    for tok in tokens:
+        if len(tok) % 2:
+            raise ScriptError(lineno, f"odd hex length: {tok}")
+        try:
+            out.extend(bytes.fromhex(tok))
+        except ValueError:
+            raise ScriptError(lineno, f"invalid hex: {tok}")
+    return out
+
+
+class ApduLine:
+    __slots__ = ("lineno", "parts", "expect", "repeat")
+
+    def __init__(self, lineno: int, parts, expect: str, repeat: int):
+        self.lineno = lineno
+        self.parts = parts
+        self.expect = expect
+        self.repeat = repeat
+
+    def build(self, variables: dict) -> list[int]:
+        apdu = []
+        for kind, value in self.parts:
+            if kind == "bytes":
+                apdu.extend(value)
+                continue
+            if value not in variables:
+                raise ScriptError(self.lineno, f"undefined variable: {value}")
+            if kind == "len":
+                apdu.append(len(variables[value]) & 0xFF)
+            else:
+                apdu.extend(variables[value])
+        return apdu
+
+    def matches(self, sw1: int, sw2: int) -> bool:
+        actual = f"{sw1:02X}{sw2:02X}"
+        return all(e == "X" or e == a for e, a in zip(self.expect.upper(), actual))
+
+
+def _parse_apdu(lineno: int, text: str) -> ApduLine:
+    expect = "90XX"
+    if "=>" in text:
+        text, sw = text.split("=>", 1)
+        sw = sw.strip().replace(" ", "")
+        if not _SW.match(sw):
+            raise ScriptError(lineno, f"invalid status word: {sw}")
+        expect = sw
+
+    tokens = text.split()
+    repeat = 1
+    if tokens and tokens[0].lower() == "repeat":
+        if len(tokens) < 2 or not tokens[1].isdigit():
+            raise ScriptError(lineno, "repeat needs a count")
+        repeat = int(tokens[1])
+        tokens = tokens[2:]
+
+    parts = []
+    for tok in tokens:
+        m = _VAR.match(tok)
+        if m:
+            parts.append(("len" if m.group(1) else "var", m.group(2)))
+        else:
+            parts.append(("bytes", _hex_tokens([tok], lineno)))
+    if not parts:
+        raise ScriptError(lineno, "empty APDU")
+    return ApduLine(lineno, parts, expect, repeat)
+
+
+def parse_script(text: str) -> list:
+    root: list = []
+    stack = [root]
+
+    for lineno, raw in enumerate(text.splitlines(), start=1):
+        line = _COMMENT.sub("", raw).strip()
+        if not line:
+            continue
+        head = line.split()[0].lower()
+
+        if head == "let":
+            m = re.match(r"^let\s+([A-Za-z_][A-Za-z0-9_]*)\s*=\s*(.*)$", line, re.I)
+            if not m:
+                raise ScriptError(lineno, "expected: let NAME = HEX")
+            stack[-1].append(("let", m.group(1), _hex_tokens(m.group(2).split(), lineno)))
+        elif head == "for":
+            m = re.match(
+                r"^for\s+([A-Za-z_][A-Za-z0-9_]*)\s*=\s*([0-9A-Fa-f]+)\.\.([0-9A-Fa-f]+)(?:\s+step\s+([0-9A-Fa-f]+))?$",
+                line, re.I,
+            )
+            if not m:
+                raise ScriptError(lineno, "expected: for NAME = START..END [step N]")
+            step = int(m.group(4), 16) if m.group(4) else 1
+            if step <= 0:
+                raise ScriptError(lineno, "step must be positive")
+            body: list = []
+            stack[-1].append(("for", m.group(1), int(m.group(2), 16), int(m.group(3), 16), step, body))
+            stack.append(body)
+        elif head == "end":
+            if len(stack) == 1:
+                raise ScriptError(lineno, "end without for")
+            stack.pop()
+        else:
+            stack[-1].append(("apdu", _parse_apdu(lineno, line)))
+
+    if len(stack) != 1:
+        raise ScriptError(0, "missing end")
+    return root
+
+
+class ScriptResult:
+
+    def __init__(self):
+        self.apdus = 0
+        self.failures = 0
+        self.bytes = 0
+        self.apdu_time = 0.0
+        self.elapsed = 0.0
+
+    def summary(self) -> str:
+        rate = self.apdus / self.elapsed if self.elapsed > 0 else 0.0
+        avg = self.apdu_time / self.apdus * 1000.0 if self.apdus else 0.0
+        throughput = self.bytes / self.elapsed / 1024 if self.elapsed > 0 else 0.0
+        return (
+            f"APDU {self.apdus}, {tr('label.errors')} {self.failures}, "
+            f"{self.elapsed * 1000.0:.1f} ms ({avg:.2f} ms/APDU, {rate:.0f} APDU/s, "
+            f"{throughput:.1f} kB/s)"
+        )
+
+
+class ScriptRunner:
+
+    def __init__(self, card, out=print, verbose: bool = True, stop_on_error: bool = False):
+        self.card = card
+        self.out = out
+        self.verbose = verbose
+        self.stop_on_error = stop_on_error
+
+    def run(self, ops, variables=None) -> ScriptResult:
+        result = ScriptResult()
+        start = time.perf_counter()
+        try:
+            self._run_block(ops, dict(variables or {}), result)
+        finally:
+            result.elapsed = time.perf_counter() - start
+        return result
+
+    def _run_block(self, ops, variables, result):
+        for op in ops:
+            kind = op[0]
+            if kind == "let":
+                variables[op[1]] = op[2]
+            elif kind == "for":
+                _, name, first, last, step, body = op
+                for value in range(first, last + 1, step):
+                    variables[name] = [(value >> 8) & 0xFF, value & 0xFF]
+                    self._run_block(body, variables, result)
+            else:
+                self._run_apdu(op[1], variables, result)
+
+    def _run_apdu(self, line: ApduLine, variables, result):
+        apdu = line.build(variables)
+        tx = self.card.tx
+        for _ in range(line.repeat):
+            t0 = time.perf_counter()
+            try:
+                data = tx(apdu, f"#{line.lineno}")
+                sw1, sw2 = self.card.last_sw
+            except ApduError as exc:
+                data = []
+                sw1, sw2 = exc.sw1, exc.sw2
+            duration = time.perf_counter() - t0
+
+            ok = line.matches(sw1, sw2)
+            result.apdus += 1
+            result.apdu_time += duration
+            result.bytes += len(apdu) + len(data) + 2
+            if not ok:
+                result.failures += 1
+
+            if self.verbose or not ok:
+                status = "OK" if ok else f"FAIL ({line.expect})"
+                text = f"{line.lineno:4d}  {hex_bytes(apdu)}  -> {sw1:02X}{sw2:02X}  {len(data):3d}B  {duration * 1000.0:7.2f} ms  {status}"
+                if data and self.verbose:
+                    text += f"\n      {hex_bytes(data[:32])}{' …' if len(data) > 32 else ''}"
+                self.out(text)
+
+            if not ok and self.stop_on_error:
+                raise ScriptError(line.lineno, f"SW {sw1:02X}{sw2:02X} != {line.expect}")
+
+
+def _open_card(args, stats):
+    from controllers.app_controller import AppController
+
+    if args.virtual:
+        from core.virtual_card import VirtualCard, VirtualReader
+
+        reader = VirtualReader(VirtualCard(args.virtual.upper()), f"Virtual {args.virtual.upper()}")
+        pcsc = None
+    else:
+        from core.pcsc_manager import PCSCManager
+
+        pcsc = PCSCManager(logger=print)
+        if args.reader:
+            reader = next((r for r in pcsc.list_readers() if args.reader.lower() in str(r).lower()), None)
+            if reader is None:
+                raise Exception(f"{tr('msg.no_readers')}: {args.reader}")
+        else:
+            reader = pcsc.auto_select_reader()
+
+    controller = AppController(pcsc, None, logger=print if args.log else (lambda msg: None))
+    controller.apdu_stats = stats
+    # Without --log the sink is closed, so tx builds no events in the timed loop.
+    if args.log:
+        controller.log_sink = ApduLogSink(print, level=DEBUG)
+    else:
+        controller.log_sink = ApduLogSink(lambda item: None, level=ERROR + 1)
+    controller.connect_reader(reader)
+    card_type = args.type.upper() if args.type else controller.detect_card_type()
+    card = controller.create_card(card_type)
+    return controller, card, reader, card_type
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="app.py --script", description="Run a raw APDU script.")
+    parser.add_argument("script")
+    parser.add_argument("--reader", help="reader name (substring)")
+    parser.add_argument("--virtual", metavar="TYPE", help="run against an emulated card, e.g. SLE4442")
+    parser.add_argument("--type", help="card type, skips ATR detection")
+    parser.add_argument("--repeat", type=int, default=1, help="run the whole script N times")
+    parser.add_argument("--quiet", action="store_true", help="only print failures and totals")
+    parser.add_argument("--stop-on-error", action="store_true")
+    parser.add_argument("--log", action="store_true", help="print driver log lines")
+    args = parser.parse_args(argv)
+
+    init_language("it")
+
+    try:
+        with open(args.script, "r", encoding="utf-8") as f:
+            ops = parse_script(f.read())
+    except (OSError, ScriptError) as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    from core.apdu_stats import ApduStats
+
+    stats = ApduStats()
+    try:
+        controller, card, reader, card_type = _open_card(args, stats)
+    except Exception as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    print(f"{reader} · {card_type} · ATR {hex_bytes(controller.conn.getATR())}")
+    runner = ScriptRunner(card, verbose=not args.quiet, stop_on_error=args.stop_on_error)
+    failures = 0
+    try:
+        for n in range(max(1, args.repeat)):
+            result = runner.run(ops)
+            failures += result.failures
+            prefix = f"[{n + 1}/{args.repeat}] " if args.repeat > 1 else ""
+            print(prefix + result.summary())
+    except ScriptError as e:
+        print(e, file=sys.stderr)
+        failures += 1
+    finally:
+        controller.disconnect_reader()
+
+    table = stats.table_text()
+    if table:
+        print(table)
+    return 1 if failures else 0
@@ -0,0 +1,160 @@
+import threading
+import time
+from collections import deque
+
+from core.language_manager import tr
+
+
+# Histogram bucket upper edges in milliseconds; the last bucket is open.
+HIST_EDGES_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+# Gaps between two APDUs longer than this are idle time, not host overhead.
+HOST_GAP_LIMIT = 1.0
+
+
+def percentile(sorted_values, p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * p / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+class _Bucket:
+    __slots__ = ("count", "errors", "bytes_sent", "bytes_received", "total", "samples", "histogram")
+
+    def __init__(self, max_samples):
+        self.count = 0
+        self.errors = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.total = 0.0
+        self.samples = deque(maxlen=max_samples)
+        self.histogram = [0] * (len(HIST_EDGES_MS) + 1)
+
+    def add(self, duration, sent, received, ok):
+        self.count += 1
+        if not ok:
+            self.errors += 1
+        self.bytes_sent += sent
+        self.bytes_received += received
+        self.total += duration
+        self.samples.append(duration)
+
+        ms = duration * 1000.0
+        for i, edge in enumerate(HIST_EDGES_MS):
+            if ms <= edge:
+                self.histogram[i] += 1
+                break
+        else:
+            self.histogram[-1] += 1
+
+    def merge(self, other):
+        self.count += other.count
+        self.errors += other.errors
+        self.bytes_sent += other.bytes_sent
+        self.bytes_received += other.bytes_received
+        self.total += other.total
+        self.samples.extend(other.samples)
+        self.histogram = [a + b for a, b in zip(self.histogram, other.histogram)]
+
+    def as_dict(self) -> dict:
+        ordered = sorted(self.samples)
+        moved = self.bytes_sent + self.bytes_received
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "total_s": self.total,
+            "mean_ms": (self.total / self.count * 1000.0) if self.count else 0.0,
+            "p50_ms": percentile(ordered, 50) * 1000.0,
+            "p95_ms": percentile(ordered, 95) * 1000.0,
+            "p99_ms": percentile(ordered, 99) * 1000.0,
+            "bytes_per_s": (moved / self.total) if self.total > 0 else 0.0,
+            "histogram": list(self.histogram),
+        }
+
+
+class ApduStats:
+    """
+    Running per-APDU timings bucketed by card type and INS byte. Time
+    a card thread spends between consecutive APDUs is kept as host time, so a
+    slow session can be attributed to the host or to reader and card.
+    Safe to feed from several card threads at once.
+    """
+
+    def __init__(self, max_samples: int = 4096):
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._buckets: dict[tuple, _Bucket] = {}
+        self.host_time = 0.0
+        self._last_end: dict[int, float] = {}
+        self.version = 0
+
+    def reset(self):
+        with self._lock:
+            self._buckets = {}
+            self.host_time = 0.0
+            self._last_end = {}
+            self.version += 1
+
+    def record(self, card_type: str, ins: int, duration: float, sent: int, received: int, ok: bool = True):
+        now = time.perf_counter()
+        thread = threading.get_ident()
+        with self._lock:
+            last = self._last_end.get(thread)
+            if last is not None:
+                gap = now - duration - last
+                if 0 < gap < HOST_GAP_LIMIT:
+                    self.host_time += gap
+            self._last_end[thread] = now
+
+            key = (card_type, ins)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = _Bucket(self.max_samples)
+            bucket.add(duration, sent, received, ok)
+            self.version += 1
+
+    def snapshot(self) -> list[dict]:
+        with self._lock:
+            rows = []
+            for (card_type, ins), bucket in sorted(self._buckets.items(), key=lambda kv: (str(kv[0][0]), kv[0][1])):
+                row = bucket.as_dict()
+                row["card_type"] = card_type
+                row["ins"] = ins
+                rows.append(row)
+            return rows
+
+    def totals(self) -> dict:
+        with self._lock:
+            total = _Bucket(None)
+            for bucket in self._buckets.values():
+                total.merge(bucket)
+            out = total.as_dict()
+            out["host_s"] = self.host_time
+            busy = total.total + self.host_time
+            out["host_share"] = (self.host_time / busy) if busy > 0 else 0.0
+            return out
+
+    def summary_text(self) -> str:
+        t = self.totals()
+        if not t["count"]:
+            return ""
+        return (
+            f"APDU {t['count']} · p50 {t['p50_ms']:.1f} ms · p95 {t['p95_ms']:.1f} ms"
+            f" · p99 {t['p99_ms']:.1f} ms · {t['bytes_per_s'] / 1024:.1f} kB/s"
+            f" · host {t['host_share'] * 100:.0f}% · {tr('label.errors')} {t['errors']}"
+        )
+
+    def table_text(self) -> str:
+        lines = []
+        for row in self.snapshot():
+            lines.append(
+                f"{row['card_type']} INS {row['ins']:02X}: n={row['count']} "
+                f"p50={row['p50_ms']:.1f} p95={row['p95_ms']:.1f} p99={row['p99_ms']:.1f} ms "
+                f"{row['bytes_per_s'] / 1024:.1f} kB/s err={row['errors']}"
+            )
+        return "\n".join(lines)
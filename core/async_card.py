@@ -0,0 +1,148 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from controllers.app_controller import AppController
+
+
+_executors: dict[str, ThreadPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+class TransferCancelled(Exception):
+    pass
+
+
+def _executor_for(reader) -> ThreadPoolExecutor:
+    name = str(reader)
+    with _executors_lock:
+        executor = _executors.get(name)
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"card:{name}")
+            _executors[name] = executor
+        return executor
+
+
+def _resolve_reader(reader):
+    if not isinstance(reader, str):
+        return reader
+
+    from smartcard.System import readers
+
+    for r in readers():
+        if str(r) == reader:
+            return r
+    raise Exception(f"Reader not found: {reader}")
+
+
+class AsyncCard:
+    """
+    Awaitable view of a card driver. Every blocking call runs on the
+    single thread owned by the reader; cancelling an awaiting task stops
+    the transfer at the next chunk boundary.
+    """
+
+    def __init__(self, controller: AppController, executor: ThreadPoolExecutor):
+        self.controller = controller
+        self.executor = executor
+
+    @property
+    def card(self):
+        return self.controller.card
+
+    @property
+    def card_type(self):
+        return self.controller.card_type
+
+    @property
+    def atr(self):
+        return self.controller.session.atr if self.controller.session else []
+
+    def _run(self, cancel: threading.Event, fn, *args):
+        if cancel.is_set():
+            raise TransferCancelled("0/0")
+
+        def check(done, total):
+            if cancel.is_set():
+                raise TransferCancelled(f"{done}/{total}")
+
+        card = self.controller.card
+        if card is None:
+            return fn(*args)
+        previous, card.on_progress = card.on_progress, check
+        try:
+            return fn(*args)
+        finally:
+            card.on_progress = previous
+
+    async def _call(self, fn, *args):
+        # One event per call: cancelling it never reaches another job.
+        cancel = threading.Event()
+        job = self.executor.submit(self._run, cancel, fn, *args)
+        future = asyncio.wrap_future(job)
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            cancel.set()
+            if job.cancel():
+                # Still queued: it never runs.
+                raise
+            try:
+                await future
+            except Exception:
+                pass
+            raise
+
+    async def detect(self) -> str:
+        ctype = await self._call(self.controller.detect_card_type)
+        await self._call(self.controller.create_card, ctype)
+        return ctype
+
+    async def read_all(self):
+        return await self._call(lambda: self.card.read_all())
+
+    async def read_range(self, addr: int, length: int):
+        return await self._call(lambda: self.card.read_range(addr, length))
+
+    async def write_bytes(self, addr: int, data):
+        return await self._call(lambda: self.card.write_bytes(addr, data))
+
+    async def write_changes(self, data, addr: int = 0, dry_run: bool = False):
+        return await self._call(lambda: self.card.write_changes(data, addr, dry_run))
+
+    async def authenticate(self, psc):
+        return await self._call(lambda: self.card.authenticate(psc))
+
+    async def read_security_memory(self):
+        return await self._call(lambda: self.card.read_security_memory())
+
+    async def read_protection_memory(self):
+        return await self._call(lambda: self.card.read_protection_memory())
+
+    async def set_protection_bits(self, indices):
+        return await self._call(lambda: self.card.set_protection_bits(indices))
+
+    async def recover(self) -> bool:
+        return await self._call(self.controller.recover_connection)
+
+    async def close(self):
+        await self._call(self.controller.disconnect_reader)
+
+
+@asynccontextmanager
+async def open_card(reader, settings=None, logger=None, stats=None):
+    executor = _executor_for(reader)
+    loop = asyncio.get_running_loop()
+
+    controller = AppController(None, settings, logger=logger or (lambda msg: None))
+    controller.apdu_stats = stats
+    reader = await loop.run_in_executor(executor, _resolve_reader, reader)
+    await loop.run_in_executor(executor, controller.connect_reader, reader)
+
+    card = AsyncCard(controller, executor)
+    try:
+        await card.detect()
+        yield card
+    finally:
+        await loop.run_in_executor(executor, controller.disconnect_reader)
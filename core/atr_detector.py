@@ -1,4 +1,4 @@
-from core.language_manager import tr              
+from core.language_manager import tr
 
 class CardType:
     SLE4442 = "SLE4442"
@@ -8,32 +8,135 @@ class CardType:
     UNKNOWN = "UNKNOWN"
 
 
+# H1 of an ISO 7816-10 synchronous ATR: the protocol family.
+SYNC_2WIRE = 0xA2
+SYNC_3WIRE = 0x92
+
+MEMORY_SIZE = {
+    CardType.SLE4442: 256,
+    CardType.SLE5542: 256,
+    CardType.SLE4428: 1024,
+    CardType.SLE5528: 1024,
+}
+
+
+def _hex(arr) -> str:
+    return " ".join(f"{b:02X}" for b in arr)
+
+
 class ATRDetector:
+    """
+    Resolves the card type from the ATR alone when it can, and otherwise
+    with a short probe: the last byte of a 1 KB card, then the first byte
+    of a 256-byte one, then a 3-wire read. Every result is memoised per
+    ATR, so the next card with the same ATR costs no APDU at all.
+    """
 
-    @staticmethod
-    def detect(atr, conn=None, logger=None):
+    _memo: dict[tuple, str] = {}
 
-        if logger:
-            logger(tr("log.atr_received") + ": " + " ".join(f"{b:02X}" for b in atr))
+    @staticmethod
+    def sync_header(atr):
+        """H1..H4 of a synchronous card, or None."""
+        atr = list(atr)
+        hist = atr[2:2 + (atr[1] & 0x0F)] if len(atr) >= 2 and atr[0] == 0x3B else atr
+        return hist[:4] if len(hist) >= 4 else None
 
+    @staticmethod
+    def memory_size(header) -> int:
+        # H2: data units 2^(n+6) in bits 6..3, unit length 2^m bits in 2..0.
+        h2 = header[1]
+        return (1 << (((h2 >> 3) & 0x0F) + 6)) * (1 << (h2 & 0x07)) // 8
 
+    @classmethod
+    def from_atr(cls, atr) -> str:
         if atr[:4] == [0x3B, 0x04, 0xA2, 0x13]:
-            if logger: logger(tr("msg.detected_4442"))
             return CardType.SLE4442
 
         if atr[:4] == [0x3B, 0x04, 0x92, 0x23]:
-            if logger: logger("Rilevata tramite ATR → SLE4428")
             return CardType.SLE4428
 
-     
         if len(atr) >= 6:
             hist = atr[-5:]
-          
             if hist[0] == 0xA2:
                 return CardType.SLE5542
             if hist[0] == 0x28:
                 return CardType.SLE5528
 
-        if logger:
-            logger(tr("msg.atr_unknown"))
+        header = cls.sync_header(atr)
+        if header is not None:
+            size = cls.memory_size(header)
+            if header[0] == SYNC_2WIRE and size == 256:
+                return CardType.SLE4442
+            if header[0] == SYNC_3WIRE and size == 1024:
+                return CardType.SLE4428
         return CardType.UNKNOWN
+
+    @staticmethod
+    def _answers(conn, apdu, expect: int = 0) -> bool:
+        try:
+            data, sw1, sw2 = conn.transmit(list(apdu))
+        except Exception:
+            return False
+        return sw1 == 0x90 and len(data) >= expect
+
+    @classmethod
+    def probe(cls, conn, profile=None, logger=None) -> str:
+        if profile is None:
+            from drivers.reader_profiles import ACS_PROFILE as profile
+        from drivers.acr_commands import build_3w_read9
+
+        def step(code, apdu, expect):
+            select = profile.select(code)
+            if select:
+                cls._answers(conn, select)
+            return cls._answers(conn, apdu, expect)
+
+        # Byte 1023 exists only on the 1 KB 3-wire cards, so one read
+        # tells both the protocol family and the size.
+        if step(0x05, profile.read(0x3FF, 1), 1):
+            return CardType.SLE4428
+        if step(0x06, profile.read(0x00, 1), 1):
+            return CardType.SLE4442
+        if profile.supports_3wire and cls._answers(conn, build_3w_read9(0), 4):
+            return CardType.SLE5528
+        return CardType.UNKNOWN
+
+    @classmethod
+    def detect(cls, atr, conn=None, logger=None, profile=None):
+        atr = list(atr)
+        if logger:
+            logger(tr("log.atr_received") + ": " + _hex(atr))
+
+        key = tuple(atr)
+        ctype = cls._memo.get(key)
+        if ctype is not None:
+            if logger: logger(f"{tr('log.card_type_cached')} → {ctype}")
+            return ctype
+
+        ctype = cls.from_atr(atr)
+        if ctype != CardType.UNKNOWN:
+            if logger: logger(f"{tr('log.card_type_atr')} → {ctype}")
+        elif conn is not None:
+            ctype = cls.probe(conn, profile, logger)
+            if logger and ctype != CardType.UNKNOWN:
+                logger(f"{tr('log.card_type_probed')} → {ctype} ({MEMORY_SIZE[ctype]} bytes)")
+
+        if ctype == CardType.UNKNOWN:
+            if logger:
+                logger(tr("msg.atr_unknown"))
+            return ctype
+
+        cls._memo[key] = ctype
+        return ctype
+
+    @classmethod
+    def known(cls, atr):
+        return cls._memo.get(tuple(atr))
+
+    @classmethod
+    def remember(cls, atr, card_type: str):
+        cls._memo[tuple(atr)] = card_type
+
+    @classmethod
+    def forget(cls, atr):
+        cls._memo.pop(tuple(atr), None)
@@ -0,0 +1,206 @@
+from contextlib import contextmanager
+
+from core.language_manager import tr
+from core.atr_detector import ATRDetector, CardType
+from core.card_state import CardStateCache
+
+try:
+    from smartcard.ExclusiveTransmitCardConnection import ExclusiveTransmitCardConnection
+    from smartcard.scard import SCARD_SHARE_EXCLUSIVE, SCARD_SHARE_SHARED, SCARD_RESET_CARD
+except ImportError:
+    ExclusiveTransmitCardConnection = None
+    SCARD_SHARE_EXCLUSIVE = 1
+    SCARD_SHARE_SHARED = 2
+    SCARD_RESET_CARD = 1
+
+
+class CardSession:
+    """
+    Owns the connection to one reader: opens it exclusively, keeps the
+    detected card type and driver across reconnects and groups multi-APDU
+    driver operations into PC/SC transactions.
+    """
+
+    def __init__(self, reader, logger=None, exclusive: bool = True, wrap=None):
+        self.reader = reader
+        self.log = logger if logger else (lambda msg: None)
+        self.exclusive = exclusive
+        self.wrap = wrap
+        self.conn = None
+        self.atr: list[int] = []
+        self.card_type = None
+        self.card = None
+        self.cache = CardStateCache()
+        self._tx_depth = 0
+        self._locked = None
+
+    def _log(self, msg):
+        self.log(msg)
+
+    @property
+    def is_open(self) -> bool:
+        return self.conn is not None
+
+    def _share_mode(self):
+        return SCARD_SHARE_EXCLUSIVE if self.exclusive else SCARD_SHARE_SHARED
+
+    def open(self):
+        raw = self.reader.createConnection()
+        if ExclusiveTransmitCardConnection is not None and not hasattr(raw, "lock"):
+            raw = ExclusiveTransmitCardConnection(raw)
+
+        try:
+            raw.connect(mode=self._share_mode())
+        except Exception as exc:
+            if not self.exclusive:
+                raise
+            self._log(f"{tr('log.exclusive_unavailable')}: {exc}")
+            raw.connect(mode=SCARD_SHARE_SHARED)
+
+        conn = self.wrap(raw, self.reader) if self.wrap else raw
+        atr = list(conn.getATR())
+
+        self.cache.clear()
+        if self.atr and atr != self.atr:
+            self.invalidate()
+
+        self.conn = conn
+        self.atr = atr
+        if self.card is not None:
+            self.card.conn = conn
+            self.card.session = self
+        return atr
+
+    def close(self):
+        # Nothing proves the next open finds the same card: protection,
+        # PSC and partial transfers go with the connection.
+        self._disconnect()
+        self.cache.clear()
+        if self.card is not None:
+            self.card.forget_card()
+
+    def _disconnect(self):
+        self._unlock()
+        self.cache.reset()
+        if self.conn is not None:
+            try:
+                self.conn.disconnect()
+            except Exception:
+                pass
+        self.conn = None
+
+    def invalidate(self):
+        self.card = None
+        self.card_type = None
+        self.cache.clear()
+
+    def detect_card_type(self, profile=None) -> str:
+        if self.card_type is not None:
+            return self.card_type
+        if self.conn is None:
+            raise Exception(tr("error.no_connection"))
+
+        ctype = ATRDetector.detect(self.atr, self.conn, logger=self.log, profile=profile)
+        # A probe may have left the reader on another card code.
+        self.cache.drop("select")
+        if ctype == CardType.UNKNOWN:
+            self._log(tr("msg.fallback_4442"))
+            ctype = CardType.SLE4442
+        self.card_type = ctype
+        return ctype
+
+    def _same_card(self, card, fingerprint) -> bool:
+        if fingerprint is None:
+            return False
+        try:
+            return card.read_fingerprint() == fingerprint
+        except Exception as exc:
+            self._log(f"{tr('log.reconnect_failed')}: {exc}")
+            return False
+
+    def attach(self, card):
+        card.session = self
+        card.cache = self.cache
+        self.card = card
+        return card
+
+    def _lock(self):
+        conn = self.conn
+        if conn is None or not hasattr(conn, "lock"):
+            return
+        try:
+            conn.lock()
+            self._locked = conn
+        except Exception as exc:
+            self._log(f"{tr('log.transaction_unavailable')}: {exc}")
+
+    def _unlock(self):
+        conn, self._locked = self._locked, None
+        if conn is not None:
+            try:
+                conn.unlock()
+            except Exception:
+                pass
+
+    @contextmanager
+    def transaction(self):
+        if self._tx_depth == 0:
+            self._lock()
+        self._tx_depth += 1
+        try:
+            yield
+        finally:
+            self._tx_depth -= 1
+            if self._tx_depth == 0:
+                self._unlock()
+
+    def recover(self):
+        """
+        Warm-resets the card (or reconnects when the reader cannot) and
+        keeps card type, driver and memory image when the same card comes
+        back. Every card of a type shares one ATR, so "the same card" means
+        the header bytes, IC serial included, read back unchanged; only
+        then is a PSC already accepted in this session replayed. Returns
+        False when the card could not be confirmed.
+        """
+        card = self.card
+        was_auth = bool(card is not None and card.is_authenticated)
+        psc = getattr(card, "auth_psc", None) if card is not None else None
+        fingerprint = card.fingerprint() if card is not None else None
+        old_atr = list(self.atr)
+
+        self._log(tr("log.card_reset"))
+        conn = self.conn
+        self._unlock()
+        try:
+            conn.reconnect(mode=self._share_mode(), disposition=SCARD_RESET_CARD)
+            atr = list(conn.getATR())
+        except Exception:
+            self._disconnect()
+            atr = self.open()
+
+        if atr != old_atr:
+            self.atr = atr
+            self.invalidate()
+            return False
+
+        self.cache.reset()
+        if self._tx_depth > 0:
+            self._lock()
+        if card is None:
+            return True
+
+        card.conn = self.conn
+        card.is_authenticated = False
+        if not self._same_card(card, fingerprint):
+            self._log(tr("log.card_identity_unconfirmed"))
+            self.cache.clear()
+            card.forget_card()
+            return False
+
+        if was_auth and psc:
+            try:
+                card.authenticate(psc)
+            except Exception as exc:
+                self._log(f"{tr('error.auth_failed')} {exc}")
+        return True
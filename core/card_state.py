@@ -0,0 +1,43 @@
+class CardStateCache:
+    """
+    Card state already fetched in this session, so every consumer after
+    the first is served without an APDU. Entries:
+
+        select      card code the reader was switched to
+        security    raw security memory
+        protection  raw protection memory
+
+    Writers keep entries current; authentication and PSC changes drop
+    "security"; a reset or reconnect drops "select" and "security"; a
+    removed or different card drops everything. The memory image itself
+    stays with the driver, which updates it on every confirmed write.
+    """
+
+    CONNECTION = ("select", "security")
+
+    def __init__(self):
+        self._entries: dict[str, object] = {}
+
+    def has(self, key: str) -> bool:
+        return key in self._entries
+
+    def get(self, key: str, default=None):
+        value = self._entries.get(key, default)
+        if isinstance(value, bytes):
+            return list(value)
+        return value
+
+    def put(self, key: str, value):
+        if isinstance(value, (list, bytearray)):
+            value = bytes(value)
+        self._entries[key] = value
+
+    def drop(self, *keys):
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def reset(self):
+        self.drop(*self.CONNECTION)
+
+    def clear(self):
+        self._entries.clear()
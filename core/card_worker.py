@@ -2,20 +2,76 @@ from PySide6.QtCore import QObject, Signal, Slot
 
 class CardWorker(QObject):
     finished = Signal(object)
+    # run_job results: (job, result), kept apart from card reads.
+    job_finished = Signal(str, object)
     error = Signal(str)
     log = Signal(str)
+    progress = Signal(int, int)
+    chunk = Signal(int, list)
 
     def __init__(self, controller):
         super().__init__()
         self.controller = controller
+        self.controller.on_progress = self.progress.emit
+        self.controller.on_chunk = self.chunk.emit
 
     @Slot()
     def read_card(self):
         try:
-            ctype = self.controller.detect_card_type()
-            self.log.emit(f"Tipo di carta: {ctype}")
-            data = self.controller.load_card(ctype)
-            self.finished.emit(data)
+            self.finished.emit(self._read())
+        except Exception as e:
+            self.error.emit(str(e))
+
+    def _read(self):
+        ctype = self.controller.detect_card_type()
+        self.log.emit(f"Tipo di carta: {ctype}")
+        return self.controller.load_card(ctype)
+
+    @Slot(int, int)
+    def read_pages(self, first, last):
+        # Results travel through the chunk signal only: finished would
+        # reload the whole editor.
+        try:
+            card = self.controller.card
+            if card is not None and not card.memory_loaded:
+                card.ensure_pages(first, last)
+        except Exception as e:
+            self.error.emit(str(e))
+
+    @Slot()
+    def complete_dump(self):
+        try:
+            self.finished.emit(self.controller.complete_dump())
+        except Exception as e:
+            self.error.emit(str(e))
+
+    @Slot(str, list)
+    def run_job(self, job, args):
+        try:
+            if job == "connect":
+                result = list(self.controller.connect_reader(*args))
+            elif job == "read":
+                result = self._read()
+            elif job == "authenticate":
+                self.controller.card.authenticate(*args)
+                result = True
+            elif job == "write":
+                self.controller.card.write_bytes(*args)
+                result = True
+            elif job == "write_changes":
+                result = self.controller.card.write_changes(*args)
+            elif job == "protect":
+                self.controller.card.set_protection_bits(*args)
+                result = True
+            elif job == "invalidate":
+                self.controller.invalidate_card()
+                result = True
+            elif job == "disconnect":
+                self.controller.disconnect_reader()
+                result = True
+            else:
+                raise ValueError(f"Unknown job: {job}")
+            self.job_finished.emit(job, result)
         except Exception as e:
             self.error.emit(str(e))
 
@@ -1,12 +1,14 @@
 from smartcard.System import readers
 from smartcard.Exceptions import NoCardException
 from core.language_manager import tr
+from core.card_session import CardSession
 
 class PCSCManager:
     
     def __init__(self, logger=None):
         self.reader = None
         self.conn = None
+        self.session = None
         self.log = logger if logger else (lambda x: None)
                                                                  
     def _log(self, msg):
@@ -41,8 +43,10 @@ class PCSCManager:
             reader = self.auto_select_reader()
 
         try:
-            self.conn = reader.createConnection()
-            self.conn.connect()
+            self.session = CardSession(reader, logger=self.log)
+            self.session.open()
+            self.conn = self.session.conn
+            self.reader = reader
             self._log(f"{tr('msg.connected_to')}: {reader}")
         except NoCardException:
             raise Exception(tr('msg.no_card_inserted'))
@@ -50,11 +54,9 @@ class PCSCManager:
             raise Exception(f"{tr('msg.error_connect')} {e}")
 
     def disconnect(self):
-        if self.conn:
-            try:
-                self.conn.disconnect()
-            except:
-                pass
+        if self.session:
+            self.session.close()
+        self.session = None
         self.conn = None
         self._log(tr('msg.reader_disconnected'))
          
@@ -0,0 +1,62 @@
+import json
+import os
+import threading
+
+
+class ReaderCapsCache:
+    """
+    Chunk sizes learned per reader and ATR. One instance may be shared by
+    several card threads: updates and saves are serialised, and the file
+    is replaced in one step so a reader never sees it half written.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.data: dict[str, dict] = {}
+        self._lock = threading.RLock()
+        self.load()
+
+    @staticmethod
+    def key(reader, atr) -> str:
+        atr_hex = "".join(f"{b:02X}" for b in (atr or []))
+        return f"{reader}|{atr_hex}"
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                loaded = json.load(f)
+            if isinstance(loaded, dict):
+                self.data = loaded
+        except Exception:
+            self.data = {}
+
+    def save(self):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = f"{self.path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.data, f, indent=4)
+            os.replace(tmp, self.path)
+
+    def get(self, reader, atr) -> dict:
+        with self._lock:
+            return dict(self.data.get(self.key(reader, atr), {}))
+
+    def update(self, reader, atr, **values):
+        with self._lock:
+            entry = self.data.setdefault(self.key(reader, atr), {})
+            changed = False
+            for k, v in values.items():
+                if v is not None and entry.get(k) != v:
+                    entry[k] = v
+                    changed = True
+            if changed:
+                self.save()
+            return changed
+
+    def forget(self, reader, atr):
+        with self._lock:
+            if self.data.pop(self.key(reader, atr), None) is not None:
+                self.save()
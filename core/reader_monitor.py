@@ -0,0 +1,127 @@
+import threading
+
+from PySide6.QtCore import QObject, Signal, Slot
+
+from smartcard.scard import (
+    INFINITE,
+    SCARD_E_CANCELLED,
+    SCARD_E_NO_READERS_AVAILABLE,
+    SCARD_E_TIMEOUT,
+    SCARD_E_UNKNOWN_READER,
+    SCARD_S_SUCCESS,
+    SCARD_SCOPE_USER,
+    SCARD_STATE_CHANGED,
+    SCARD_STATE_PRESENT,
+    SCARD_STATE_UNAWARE,
+    SCardCancel,
+    SCardEstablishContext,
+    SCardGetErrorMessage,
+    SCardGetStatusChange,
+    SCardListReaders,
+    SCardReleaseContext,
+)
+
+PNP_NOTIFICATION = "\\\\?PnP?\\Notification"
+
+# Without PnP support the status call fails at once instead of blocking;
+# the loop then polls, backing off up to RETRY_MAX seconds.
+RETRY_MIN = 0.25
+RETRY_MAX = 2.0
+
+
+class ReaderMonitor(QObject):
+    """
+    Blocks in SCardGetStatusChange on every reader plus the PnP pseudo
+    reader, so it only wakes up when PC/SC reports a change. stop() may be
+    called from any thread and cancels the pending wait.
+    """
+
+    reader_added = Signal(str)
+    reader_removed = Signal(str)
+    card_inserted = Signal(str, list)
+    card_removed = Signal(str)
+    error = Signal(str)
+
+    def __init__(self):
+        super().__init__()
+        self._context = None
+        self._running = False
+        self._wake = threading.Event()
+
+    def _list_readers(self):
+        hresult, names = SCardListReaders(self._context, [])
+        if hresult != SCARD_S_SUCCESS:
+            return []
+        return list(names)
+
+    @Slot()
+    def run(self):
+        hresult, context = SCardEstablishContext(SCARD_SCOPE_USER)
+        if hresult != SCARD_S_SUCCESS:
+            self.error.emit(SCardGetErrorMessage(hresult))
+            return
+
+        self._context = context
+        self._running = True
+        self._wake.clear()
+        backoff = RETRY_MIN
+        readers = self._list_readers()
+        states = {name: SCARD_STATE_UNAWARE for name in readers}
+        states[PNP_NOTIFICATION] = SCARD_STATE_UNAWARE
+        first = True
+
+        try:
+            while self._running:
+                query = [(name, state) for name, state in states.items()]
+                timeout = 0 if first else INFINITE
+                hresult, new_states = SCardGetStatusChange(context, timeout, query)
+
+                if hresult == SCARD_E_CANCELLED:
+                    break
+                if hresult not in (
+                    SCARD_S_SUCCESS,
+                    SCARD_E_TIMEOUT,
+                    SCARD_E_UNKNOWN_READER,
+                    SCARD_E_NO_READERS_AVAILABLE,
+                ):
+                    self.error.emit(SCardGetErrorMessage(hresult))
+                    break
+                if hresult in (SCARD_E_UNKNOWN_READER, SCARD_E_NO_READERS_AVAILABLE):
+                    self._wake.wait(backoff)
+                    backoff = min(backoff * 2, RETRY_MAX)
+                else:
+                    backoff = RETRY_MIN
+
+                for name, event, atr in new_states if hresult == SCARD_S_SUCCESS else []:
+                    if name != PNP_NOTIFICATION and not first:
+                        was_present = bool(states.get(name, 0) & SCARD_STATE_PRESENT)
+                        is_present = bool(event & SCARD_STATE_PRESENT)
+                        if is_present and not was_present:
+                            self.card_inserted.emit(name, list(atr))
+                        elif was_present and not is_present:
+                            self.card_removed.emit(name)
+                    states[name] = event & ~SCARD_STATE_CHANGED
+
+                current = self._list_readers()
+                for name in current:
+                    if name not in states:
+                        states[name] = SCARD_STATE_UNAWARE
+                        self.reader_added.emit(name)
+                for name in list(states):
+                    if name != PNP_NOTIFICATION and name not in current:
+                        was_present = bool(states.pop(name) & SCARD_STATE_PRESENT)
+                        if was_present:
+                            self.card_removed.emit(name)
+                        self.reader_removed.emit(name)
+
+                first = False
+        finally:
+            self._running = False
+            SCardReleaseContext(context)
+            self._context = None
+
+    def stop(self):
+        self._running = False
+        self._wake.set()
+        if self._context is not None:
+            SCardCancel(self._context)
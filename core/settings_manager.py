@@ -22,6 +22,13 @@ class SettingsManager:
             "language": "it",
             "accent_color": "#00aaff",
             "reader_preference": None,
+            "record_apdu": False,
+            "auto_read_on_insert": False,
+            "log_level": "debug",
+            "reader_profile": "auto",
+            "lazy_read": False,
+            "consensus_reads": 1,
+            "verify_writes": False,
         }
         self.load()
         self.lang_manager = LanguageManager(self.data["language"])
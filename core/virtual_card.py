@@ -0,0 +1,444 @@
+import time
+
+from core.atr_detector import CardType
+from drivers.acr_commands import ACS, SLE3W, FIXED
+
+try:
+    from smartcard.Exceptions import CardConnectionException, NoCardException
+except ImportError:
+    class CardConnectionException(Exception):
+        pass
+
+    class NoCardException(Exception):
+        pass
+
+
+SW_OK = (0x90, 0x00)
+SW_WRONG_LENGTH = (0x67, 0x00)
+SW_SECURITY = (0x69, 0x82)
+SW_WRONG_PARAMS = (0x6A, 0x86)
+SW_BAD_ADDRESS = (0x6A, 0x82)
+SW_FUNC_NOT_SUPPORTED = (0x6A, 0x81)
+SW_INS_NOT_SUPPORTED = (0x6D, 0x00)
+SW_CLA_NOT_SUPPORTED = (0x6E, 0x00)
+
+# ATRs picked so that ATRDetector resolves each emulated chip to its driver.
+DEFAULT_ATR = {
+    CardType.SLE4442: [0x3B, 0x04, 0xA2, 0x13, 0x10, 0x91],
+    CardType.SLE5542: [0x3B, 0x05, 0xA2, 0x13, 0x10, 0x91, 0x00],
+    CardType.SLE4428: [0x3B, 0x04, 0x92, 0x23, 0x10, 0x91],
+    CardType.SLE5528: [0x3B, 0x05, 0x28, 0x23, 0x10, 0x91, 0x00],
+}
+
+_3W_HEADER = [0xFF, 0x70, 0x07, 0x6B, 0x07, 0xA6, 0x05, 0xA1, 0x03]
+
+
+class VirtualFault:
+
+    def __init__(self, kind: str, after: int = 0, sw=(0x6F, 0x00), count: int = 1, ins=None):
+        if kind not in ("sw", "short", "remove"):
+            raise ValueError(f"Unknown fault kind: {kind}")
+        self.kind = kind
+        self.after = after
+        self.sw = tuple(sw)
+        self.count = count
+        self.ins = ins
+
+
+class VirtualCard:
+    """
+    Stand-in for a pyscard connection backed by an emulated SLE chip.
+    Understands the ACS pseudo-APDUs used by the drivers and the 3-wire
+    pass-through of SLE5528; latency and faults are configurable.
+    """
+
+    def __init__(
+        self,
+        card_type: str = CardType.SLE4442,
+        memory=None,
+        psc=None,
+        atr=None,
+        reader_name: str = "Virtual SLE Reader 0",
+        latency: float = 0.0,
+        byte_time: float = 0.0,
+        write_time: float = 0.0,
+        max_read: int = 255,
+        max_write: int = 255,
+    ):
+        if card_type not in DEFAULT_ATR:
+            raise ValueError(f"Unsupported card type: {card_type}")
+
+        self.card_type = card_type
+        self.is_2wire = card_type in (CardType.SLE4442, CardType.SLE5542)
+        self.size = 256 if self.is_2wire else 1024
+        self.atr = list(atr) if atr else list(DEFAULT_ATR[card_type])
+        self.reader_name = reader_name
+
+        self.latency = latency
+        self.byte_time = byte_time
+        self.write_time = write_time
+        self.max_read = max_read
+        self.max_write = max_write
+
+        self.memory = bytearray([0xFF] * self.size)
+        if self.is_2wire:
+            self.memory[0:4] = bytes([0xA2, 0x13, 0x10, 0x91])
+        else:
+            self.memory[0:4] = bytes([0x92, 0x23, 0x10, 0x91])
+        if memory is not None:
+            image = bytes(memory)[: self.size]
+            self.memory[0:len(image)] = image
+
+        self.protected = bytearray(self.size)
+        self.psc = list(psc) if psc else [0xFF] * (3 if self.is_2wire else 2)
+        self.error_counter = self._full_counter()
+        if not self.is_2wire:
+            self._sync_psc_area()
+
+        self.present = True
+        self.connected = False
+        self.authenticated = False
+        self._verify_ok = []
+        self.faults: list[VirtualFault] = []
+
+        self.apdu_count = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.eeprom_writes = 0
+        self.transactions = 0
+
+    def _full_counter(self) -> int:
+        return 0x07 if self.is_2wire else 0xFF
+
+    def _sync_psc_area(self):
+        self.memory[FIXED.ERROR_COUNTER] = self.error_counter
+        self.memory[FIXED.PSC1] = self.psc[0]
+        self.memory[FIXED.PSC2] = self.psc[1]
+
+    def connect(self, *args, **kwargs):
+        if not self.present:
+            raise NoCardException("Virtual card not present")
+        self.connected = True
+
+    def reconnect(self, *args, **kwargs):
+        if not self.present:
+            raise NoCardException("Virtual card not present")
+        self.connected = True
+        self.authenticated = False
+        self._verify_ok = []
+
+    def disconnect(self):
+        self.connected = False
+        self.authenticated = False
+
+    def lock(self):
+        self.transactions += 1
+
+    def unlock(self):
+        pass
+
+    def getATR(self):
+        if not self.present:
+            raise NoCardException("Virtual card not present")
+        return list(self.atr)
+
+    def getReader(self):
+        return self.reader_name
+
+    def remove(self):
+        self.present = False
+        self.connected = False
+        self.authenticated = False
+
+    def insert(self):
+        self.present = True
+        self.authenticated = False
+
+    def inject_fault(self, kind: str, after: int = 0, sw=(0x6F, 0x00), count: int = 1, ins=None):
+        fault = VirtualFault(kind, after=after, sw=sw, count=count, ins=ins)
+        self.faults.append(fault)
+        return fault
+
+    def clear_faults(self):
+        self.faults.clear()
+
+    def _take_fault(self, ins: int):
+        for fault in self.faults:
+            if fault.ins is not None and fault.ins != ins:
+                continue
+            if fault.after > 0:
+                fault.after -= 1
+                continue
+            fault.count -= 1
+            if fault.count <= 0:
+                self.faults.remove(fault)
+            return fault
+        return None
+
+    def reset_counters(self):
+        self.apdu_count = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.eeprom_writes = 0
+        self.transactions = 0
+
+    def transmit(self, apdu, protocol=None):
+        if not self.present:
+            raise CardConnectionException("Virtual card removed")
+        if not self.connected:
+            raise CardConnectionException("Virtual card not connected")
+
+        apdu = list(apdu)
+        self.apdu_count += 1
+        self.bytes_sent += len(apdu)
+
+        ins = apdu[1] if len(apdu) > 1 else None
+        fault = self._take_fault(ins)
+        if fault is not None and fault.kind == "remove":
+            self.remove()
+            raise CardConnectionException("Virtual card removed during transfer")
+        if fault is not None and fault.kind == "sw":
+            self._delay(0, 0)
+            return [], fault.sw[0], fault.sw[1]
+
+        writes_before = self.eeprom_writes
+        data, sw = self._dispatch(apdu)
+        self._delay(len(data), self.eeprom_writes - writes_before)
+
+        if fault is not None and fault.kind == "short":
+            data = data[: len(data) // 2]
+
+        self.bytes_received += len(data) + 2
+        return list(data), sw[0], sw[1]
+
+    def _delay(self, n_bytes: int, n_writes: int):
+        wait = self.latency + self.byte_time * n_bytes + self.write_time * n_writes
+        if wait > 0:
+            time.sleep(wait)
+
+    def _dispatch(self, apdu):
+        if len(apdu) < 5:
+            return [], SW_WRONG_LENGTH
+        if apdu[0] != 0xFF:
+            return [], SW_CLA_NOT_SUPPORTED
+
+        ins = apdu[1]
+        handler = {
+            ACS.SELECT_CARD: self._select,
+            ACS.READ_BINARY: self._read_binary,
+            0xB1: self._read_security,
+            0xB2: self._read_protection,
+            ACS.WRITE_BINARY: self._write_binary,
+            0xD1: self._write_protection,
+            0xD2: self._change_psc,
+            ACS.VERIFY_PSC: self._verify,
+            0x70: self._three_wire,
+        }.get(ins)
+
+        if handler is None:
+            return [], SW_INS_NOT_SUPPORTED
+        return handler(apdu)
+
+    @staticmethod
+    def _body(apdu):
+        lc = apdu[4]
+        body = apdu[5:]
+        if len(body) != lc:
+            return None
+        return body
+
+    def _select(self, apdu):
+        return [], SW_OK
+
+    def _read_binary(self, apdu):
+        addr = (apdu[2] << 8) | apdu[3]
+        le = apdu[4] or 256
+        if le > self.max_read:
+            return [], SW_WRONG_LENGTH
+        if addr >= self.size:
+            return [], SW_BAD_ADDRESS
+        return self.memory[addr:addr + le], SW_OK
+
+    def _read_security(self, apdu):
+        if self.authenticated:
+            sm = [self.error_counter] + self.psc
+        else:
+            sm = [self.error_counter] + [0x00] * len(self.psc)
+        return sm[: apdu[4] or len(sm)], SW_OK
+
+    def _read_protection(self, apdu):
+        addr = (apdu[2] << 8) | apdu[3]
+        le = apdu[4]
+        limit = 32 if self.is_2wire else self.size
+
+        packed = []
+        for i in range(le):
+            byte = 0
+            for bit in range(8):
+                pos = addr + i * 8 + bit
+                free = pos >= limit or not self.protected[pos]
+                if free:
+                    byte |= 1 << bit
+            packed.append(byte)
+        return packed, SW_OK
+
+    def _write_binary(self, apdu):
+        body = self._body(apdu)
+        if body is None:
+            return [], SW_WRONG_LENGTH
+        if len(body) > self.max_write:
+            return [], SW_WRONG_LENGTH
+        if not self.authenticated:
+            return [], SW_SECURITY
+
+        addr = (apdu[2] << 8) | apdu[3]
+        if addr + len(body) > self.size:
+            return [], SW_BAD_ADDRESS
+
+        for i, b in enumerate(body):
+            self._program(addr + i, b)
+        return [], SW_OK
+
+    def _write_protection(self, apdu):
+        body = self._body(apdu)
+        if body is None:
+            return [], SW_WRONG_LENGTH
+        if not self.authenticated:
+            return [], SW_SECURITY
+
+        addr = (apdu[2] << 8) | apdu[3]
+        limit = 32 if self.is_2wire else self.size
+        if addr + len(body) > limit:
+            return [], SW_BAD_ADDRESS
+
+        for i, b in enumerate(body):
+            self._compare_and_protect(addr + i, b)
+        return [], SW_OK
+
+    def _change_psc(self, apdu):
+        body = self._body(apdu)
+        if body is None or len(body) != len(self.psc):
+            return [], SW_WRONG_LENGTH
+        if not self.authenticated:
+            return [], SW_SECURITY
+
+        self.psc = list(body)
+        self.eeprom_writes += len(body)
+        if not self.is_2wire:
+            self._sync_psc_area()
+        return [], SW_OK
+
+    def _verify(self, apdu):
+        body = self._body(apdu)
+        if body is None or len(body) != len(self.psc):
+            return [], SW_WRONG_LENGTH
+
+        if self.error_counter == 0:
+            return [], (0x90, 0x00)
+
+        self.eeprom_writes += 1
+        if list(body) == self.psc:
+            self._grant()
+        else:
+            self._deny()
+        return [], (0x90, self.error_counter)
+
+    def _grant(self):
+        self.authenticated = True
+        self.error_counter = self._full_counter()
+        if not self.is_2wire:
+            self.memory[FIXED.ERROR_COUNTER] = self.error_counter
+
+    def _deny(self):
+        self.authenticated = False
+        self.error_counter &= self.error_counter >> 1
+        if not self.is_2wire:
+            self.memory[FIXED.ERROR_COUNTER] = self.error_counter
+
+    def _program(self, addr: int, value: int, protect: bool = False):
+        if self.protected[addr]:
+            return
+        self.memory[addr] = value & 0xFF
+        self.eeprom_writes += 1
+        if protect:
+            self.protected[addr] = 1
+        if not self.is_2wire and addr in (FIXED.PSC1, FIXED.PSC2):
+            self.psc[addr - FIXED.PSC1] = value & 0xFF
+
+    def _compare_and_protect(self, addr: int, value: int):
+        if self.memory[addr] == (value & 0xFF) and not self.protected[addr]:
+            self.protected[addr] = 1
+            self.eeprom_writes += 1
+
+    def _three_wire(self, apdu):
+        if self.is_2wire:
+            return [], SW_FUNC_NOT_SUPPORTED
+        if len(apdu) < 12 or apdu[:9] != _3W_HEADER:
+            return [], SW_WRONG_PARAMS
+
+        control = apdu[9]
+        code = control & 0x3F
+        addr = ((control >> 6) & 0x03) << 8 | apdu[10]
+        value = apdu[11]
+
+        if code == SLE3W.READ_9BITS_DATA_WITH_PROTECT:
+            payload = [self.memory[addr], 0 if self.protected[addr] else 1]
+        elif code == SLE3W.READ_8BITS_DATA_NO_PROTECT:
+            payload = [self.memory[addr]]
+        elif code in (
+            SLE3W.WRITE_AND_ERASE_WITH_PROTECT & 0x3F,
+            SLE3W.WRITE_AND_ERASE_NO_PROTECT & 0x3F,
+        ):
+            if not self.authenticated:
+                return [], SW_SECURITY
+            protect = code == (SLE3W.WRITE_AND_ERASE_WITH_PROTECT & 0x3F)
+            self._program(addr, value, protect=protect)
+            payload = []
+        elif code == SLE3W.COMPARE_AND_PROTECT & 0x3F:
+            if not self.authenticated:
+                return [], SW_SECURITY
+            self._compare_and_protect(addr, value)
+            payload = []
+        elif code == SLE3W.WRITE_ERROR_COUNTER & 0x3F:
+            self.error_counter &= value
+            self.memory[FIXED.ERROR_COUNTER] = self.error_counter
+            self.eeprom_writes += 1
+            payload = []
+        elif code == SLE3W.VERIFY_PSC & 0x3F:
+            payload = self._verify_3w(addr, value)
+        else:
+            return [], SW_WRONG_PARAMS
+
+        return [0x00, len(payload)] + payload, SW_OK
+
+    def _verify_3w(self, addr: int, value: int):
+        if self.error_counter == 0:
+            return []
+
+        if addr == FIXED.PSC1:
+            self._verify_ok = [value == self.psc[0]]
+        elif addr == FIXED.PSC2 and len(self._verify_ok) == 1:
+            self._verify_ok.append(value == self.psc[1])
+            if all(self._verify_ok):
+                self._grant()
+            else:
+                self._deny()
+            self._verify_ok = []
+        return []
+
+
+class VirtualReader:
+
+    def __init__(self, card: VirtualCard = None, name: str = None):
+        self.card = card if card is not None else VirtualCard()
+        self.name = name or self.card.reader_name
+        self.card.reader_name = self.name
+
+    def createConnection(self):
+        return self.card
+
+    def __str__(self):
+        return self.name
+
+    def __repr__(self):
+        return f"VirtualReader({self.name!r})"
@@ -0,0 +1,195 @@
+import os
+from collections import deque
+
+from PySide6.QtCore import QObject, QThread, Qt, Signal, Slot
+
+from controllers.app_controller import AppController
+from core.apdu_log import ApduLogSink, INFO
+from core.card_worker import CardWorker
+from core.reader_caps import ReaderCapsCache
+
+
+class _ReaderSink(ApduLogSink):
+    """Feeds the shared sink, following its level and tagging text with the reader."""
+
+    def __init__(self, sink, name: str):
+        self.sink = sink
+        self.prefix = f"[{name}] "
+
+    @property
+    def level(self):
+        return self.sink.level
+
+    @property
+    def target(self):
+        return self.sink.target
+
+    def text(self, msg: str, level: int = INFO):
+        self.sink.text(self.prefix + msg, level)
+
+    __call__ = text
+
+
+class _ReaderSlot(QObject):
+    submit = Signal(str, list)
+    # Returns only once the worker has run the job.
+    submit_and_wait = Signal(str, list)
+
+    def __init__(self, pool, reader, controller):
+        super().__init__()
+        self.pool = pool
+        self.reader = reader
+        self.name = str(reader)
+        self.controller = controller
+        self.busy = False
+        self.current_job = None
+        self.closing = False
+
+        self.thread = QThread()
+        self.worker = CardWorker(controller)
+        self.worker.moveToThread(self.thread)
+
+        self.submit.connect(self.worker.run_job)
+        self.submit_and_wait.connect(self.worker.run_job, Qt.BlockingQueuedConnection)
+        self.worker.job_finished.connect(self._on_finished)
+        self.worker.error.connect(self._on_error)
+        self.worker.progress.connect(self._on_progress)
+        self.worker.log.connect(self._on_log)
+
+        self.sink = _ReaderSink(pool.log_sink, self.name)
+        self.controller.log = self.sink.text
+        self.controller.log_sink = self.sink
+        self.thread.start()
+
+    def start(self, job: str, args: list):
+        self.busy = True
+        self.current_job = job
+        self.pool.job_started.emit(self.name, job)
+        self.submit.emit(job, list(args))
+
+    @Slot(str, object)
+    def _on_finished(self, _job, result):
+        if self.closing:
+            return
+        job = self.current_job
+        self.busy = False
+        self.current_job = None
+        self.pool.job_finished.emit(self.name, job, result)
+        self.pool._dispatch()
+
+    @Slot(str)
+    def _on_error(self, msg):
+        if self.closing:
+            return
+        job = self.current_job
+        self.busy = False
+        self.current_job = None
+        self.pool.job_error.emit(self.name, job, msg)
+        self.pool._dispatch()
+
+    @Slot(int, int)
+    def _on_progress(self, done, total):
+        self.pool.job_progress.emit(self.name, done, total)
+
+    @Slot(str)
+    def _on_log(self, msg):
+        self.pool.log.emit(f"[{self.name}] {msg}")
+
+    def shutdown(self):
+        # A job still queued when the thread quits is dropped, so the
+        # reader is released synchronously first.
+        self.closing = True
+        self.submit_and_wait.emit("disconnect", [])
+        self.thread.quit()
+        self.thread.wait()
+
+
+class ReaderPool(QObject):
+    """
+    One CardWorker, controller and session per reader, each on its own
+    thread. Jobs are queued and handed to the target reader, or to the
+    first idle one when no reader is given, as soon as it becomes free.
+    A broadcast opens every reader just for its job and releases it
+    afterwards, so the main window can connect to any of them again.
+    """
+
+    job_started = Signal(str, str)
+    job_progress = Signal(str, int, int)
+    job_finished = Signal(str, str, object)
+    job_error = Signal(str, str, str)
+    idle = Signal()
+    log = Signal(str)
+
+    def __init__(self, pcsc, settings, log_sink=None, reader_caps=None):
+        super().__init__()
+        self.pcsc = pcsc
+        self.settings = settings
+        self.log_sink = log_sink if log_sink is not None else ApduLogSink(lambda item: self.log.emit(str(item)))
+        # One cache for every slot: ReaderCapsCache serialises the saves.
+        if reader_caps is None and settings is not None:
+            reader_caps = ReaderCapsCache(os.path.join(os.path.dirname(settings.path), "reader_caps.json"))
+        self.reader_caps = reader_caps
+        self.slots: dict[str, _ReaderSlot] = {}
+        self.queue = deque()
+        self.apdu_stats = None
+
+    def add_reader(self, reader):
+        name = str(reader)
+        if name in self.slots:
+            return self.slots[name]
+
+        controller = AppController(self.pcsc, self.settings, logger=lambda msg: None, reader_caps=self.reader_caps)
+        controller.apdu_stats = self.apdu_stats
+        slot = _ReaderSlot(self, reader, controller)
+        self.slots[name] = slot
+        return slot
+
+    def remove_reader(self, name: str):
+        slot = self.slots.pop(str(name), None)
+        if slot is None:
+            return
+        self.queue = deque(j for j in self.queue if j[2] != slot.name)
+        slot.shutdown()
+
+    def readers(self) -> list[str]:
+        return list(self.slots)
+
+    def submit(self, job: str, args=None, reader=None):
+        self.queue.append((job, list(args or []), str(reader) if reader is not None else None))
+        self._dispatch()
+
+    def broadcast(self, job: str, args=None):
+        for name, slot in self.slots.items():
+            self.submit("connect", [slot.reader], reader=name)
+            self.submit(job, args, reader=name)
+            self.submit("disconnect", [], reader=name)
+
+    def is_busy(self) -> bool:
+        return bool(self.queue) or any(s.busy for s in self.slots.values())
+
+    def _dispatch(self):
+        pending = deque()
+        while self.queue:
+            job, args, target = self.queue.popleft()
+            if target is not None:
+                slot = self.slots.get(target)
+                if slot is None:
+                    continue
+                if slot.busy or any(p[2] == target for p in pending):
+                    pending.append((job, args, target))
+                    continue
+            else:
+                slot = next((s for s in self.slots.values() if not s.busy), None)
+                if slot is None:
+                    pending.append((job, args, target))
+                    continue
+            slot.start(job, args)
+        self.queue = pending
+
+        if not self.is_busy():
+            self.idle.emit()
+
+    def shutdown(self):
+        self.queue.clear()
+        for name in list(self.slots):
+            self.remove_reader(name)
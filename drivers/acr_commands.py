@@ -89,7 +89,8 @@ def build_3w_command(cmd: int, addr: int, data: int = 0):
         0x00,           
     ]
 
-    base[9] = cmd & 0xFF
+    # Control byte: A9 A8 in the top two bits, command code below.
+    base[9] = (cmd & 0x3F) | ((addr >> 2) & 0xC0)
     base[10] = addr & 0xFF
     base[11] = data & 0xFF
     return base
@@ -112,9 +113,9 @@ def build_3w_write(addr, value, protect=True):
     return build_3w_command(cmd, addr, value)
 
 
-def build_3w_verify(psc):
-                                                 
-    return build_3w_command(SLE3W.VERIFY_PSC, FIXED.PSC1, psc[0])
+def build_3w_verify(psc, index: int = 0):
+    # One compare per PSC byte: PSC1 at 1022, then PSC2 at 1023.
+    return build_3w_command(SLE3W.VERIFY_PSC, FIXED.PSC1 + index, psc[index])
 
 
                                                                
@@ -140,21 +141,21 @@ def build_hid_read_protection(addr: int, length: int):
     ]
 
 
-def build_hid_compare_and_protect(addr: int, value: int):
+def build_hid_compare_and_protect(addr: int, value):
+    data = [value] if isinstance(value, int) else list(value)
     return [
         0xFF,
         HID.COMPARE_AND_PROTECT,
         (addr >> 8) & 0xFF,
         addr & 0xFF,
-        0x01,
-        value,
-    ]
+        len(data),
+    ] + data
 
 
 def build_hid_verify(psc):
-    return [0xFF, HID.VERIFY, 0x00, 0x00, 0x02] + list(psc)
+    return [0xFF, HID.VERIFY, 0x00, 0x00, len(psc)] + list(psc)
 
 
 def build_hid_change_psc(psc_old, psc_new):
-    return [0xFF, HID.CHANGE_PSC, 0x00, 0x00, 0x04] + list(psc_old) + list(psc_new)
+    return [0xFF, HID.CHANGE_PSC, 0x00, 0x00, len(psc_old) + len(psc_new)] + list(psc_old) + list(psc_new)
 
@@ -0,0 +1,197 @@
+import functools
+import json
+
+from drivers.acr_commands import build_3w_read9, build_3w_write, build_3w_command, SLE3W
+from drivers.reader_profiles import get_profile
+
+
+PROFILE_ACS = "acs"
+
+
+class PlanStep:
+    """
+    One precompiled APDU. addr/length describe the card memory it covers,
+    expect/skip where its payload sits in the response.
+    """
+
+    __slots__ = ("apdu", "wire", "addr", "length", "expect", "skip", "desc")
+
+    def __init__(self, apdu, addr: int = 0, length: int = 0, expect: int = 0, skip: int = 0, desc=""):
+        self.apdu = bytes(apdu)
+        # pyscard wants a list of ints; build it once here, not per transmit.
+        self.wire = list(self.apdu)
+        self.addr = addr
+        self.length = length
+        self.expect = expect
+        self.skip = skip
+        self.desc = desc
+
+    def to_dict(self) -> dict:
+        return {
+            "apdu": self.apdu.hex().upper(),
+            "addr": self.addr,
+            "length": self.length,
+            "expect": self.expect,
+            "skip": self.skip,
+            "desc": list(self.desc) if isinstance(self.desc, tuple) else self.desc,
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict):
+        desc = d.get("desc", "")
+        return cls(
+            bytes.fromhex(d["apdu"]),
+            addr=d.get("addr", 0),
+            length=d.get("length", 0),
+            expect=d.get("expect", 0),
+            skip=d.get("skip", 0),
+            desc=tuple(desc) if isinstance(desc, list) else desc,
+        )
+
+
+class ApduPlan:
+    """
+    Fixed APDU schedule for one operation (full dump, protection read,
+    range write) compiled for a card type, reader profile and chunk size.
+    Plans are immutable once built, so read plans are cached and shared.
+    """
+
+    def __init__(self, op: str, card_type: str, steps, chunk: int = 0, profile: str = PROFILE_ACS):
+        self.op = op
+        self.card_type = card_type
+        self.profile = profile
+        self.chunk = chunk
+        self.steps = tuple(steps)
+        self.total = sum(s.length for s in self.steps)
+
+    def __len__(self):
+        return len(self.steps)
+
+    def __iter__(self):
+        return iter(self.steps)
+
+    def __repr__(self):
+        return (
+            f"ApduPlan({self.op}, {self.card_type}, profile={self.profile}, "
+            f"chunk={self.chunk}, steps={len(self.steps)}, bytes={self.total})"
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "op": self.op,
+            "card_type": self.card_type,
+            "profile": self.profile,
+            "chunk": self.chunk,
+            "steps": [s.to_dict() for s in self.steps],
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict):
+        return cls(
+            d["op"],
+            d["card_type"],
+            [PlanStep.from_dict(s) for s in d.get("steps", [])],
+            chunk=d.get("chunk", 0),
+            profile=d.get("profile", PROFILE_ACS),
+        )
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+@functools.lru_cache(maxsize=64)
+def compile_read(card_type: str, addr: int, length: int, chunk: int, profile: str = PROFILE_ACS) -> ApduPlan:
+    commands = get_profile(profile)
+    steps = []
+    pos = addr
+    end = addr + length
+    while pos < end:
+        n = min(chunk, end - pos)
+        apdu = commands.read(pos, n)
+        steps.append(PlanStep(apdu, pos, n, expect=n, desc=("log.read_chunk", pos, n)))
+        pos += n
+    return ApduPlan("read", card_type, steps, chunk=chunk, profile=profile)
+
+
+@functools.lru_cache(maxsize=16)
+def compile_read_protection(card_type: str, pages: int, page_size: int, profile: str = PROFILE_ACS) -> ApduPlan:
+    commands = get_profile(profile)
+    steps = [
+        PlanStep(
+            commands.read_protection(page, page_size),
+            page * page_size,
+            page_size,
+            expect=page_size,
+            desc=("log.read_prot_page", page),
+        )
+        for page in range(pages)
+    ]
+    return ApduPlan("read_protection", card_type, steps, chunk=page_size, profile=profile)
+
+
+def compile_write(card_type: str, addr: int, data, chunk: int, profile: str = PROFILE_ACS) -> ApduPlan:
+    commands = get_profile(profile)
+    data = bytes(data)
+    steps = []
+    off = 0
+    while off < len(data):
+        part = data[off:off + chunk]
+        pos = addr + off
+        apdu = commands.write(pos, part)
+        steps.append(PlanStep(apdu, pos, len(part), desc=("log.write_chunk", pos, len(part))))
+        off += len(part)
+    return ApduPlan("write", card_type, steps, chunk=chunk, profile=profile)
+
+
+@functools.lru_cache(maxsize=16)
+def compile_3w_read(card_type: str, addr: int, length: int) -> ApduPlan:
+    # Response is 2 status bytes followed by data byte and protection bit.
+    steps = [
+        PlanStep(build_3w_read9(a), a, 1, expect=2, skip=2, desc=("log.read_byte_9", a))
+        for a in range(addr, addr + length)
+    ]
+    return ApduPlan("read9", card_type, steps, chunk=1)
+
+
+def compile_3w_write(card_type: str, addr: int, data, protect: bool = False) -> ApduPlan:
+    steps = [
+        PlanStep(build_3w_write(addr + i, b, protect=protect), addr + i, 1, desc=("log.write_byte", addr + i))
+        for i, b in enumerate(data)
+    ]
+    return ApduPlan("write3w", card_type, steps, chunk=1)
+
+
+def compile_3w_protect(card_type: str, addr: int, data) -> ApduPlan:
+    steps = [
+        PlanStep(build_3w_command(SLE3W.COMPARE_AND_PROTECT, addr + i, b), addr + i, 1, desc=("log.protect_byte", addr + i))
+        for i, b in enumerate(data)
+    ]
+    return ApduPlan("protect3w", card_type, steps, chunk=1)
+
+
+def coalesce_ranges(ranges, max_len: int, gap: int = 0):
+    """
+    Merges (addr, length) ranges into the fewest spans that cover them.
+    Two ranges share a span when at most gap unrequested bytes lie between
+    them and the span stays within max_len; a single range longer than
+    max_len keeps its own span and is chunked by the read itself.
+    """
+    spans = []
+    for addr, length in sorted((a, n) for a, n in ranges if n > 0):
+        end = addr + length
+        if spans:
+            start, last_end = spans[-1]
+            if addr <= last_end + gap and max(end, last_end) - start <= max_len:
+                spans[-1] = (start, max(end, last_end))
+                continue
+            if addr < last_end:
+                spans[-1] = (start, max(end, last_end))
+                continue
+        spans.append((addr, end))
+    return [(start, end - start) for start, end in spans]
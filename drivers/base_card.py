@@ -1,16 +1,145 @@
+import functools
+import time
+from collections import Counter
+
 from core.language_manager import tr
+from core.apdu_log import ApduEvent, DEBUG, ERROR, SEND, RECV, FAIL, render_desc
+from drivers.apdu_plan import compile_read, compile_write, coalesce_ranges
+from drivers.reader_profiles import ACS_PROFILE
+from drivers.write_planner import WritePlan, plan_writes, diff_runs, WRITE
+from model.protection_map import ProtectionMap, index_runs
+from model.page16 import Page16
+from core.card_state import CardStateCache
+
+
+READ_CHUNK_STEPS = (255, 240, 128, 64, 32, 16, 8)
+WRITE_CHUNK_STEPS = (64, 32, 16, 8, 4, 1)
+
+# Unrequested bytes worth reading to save one APDU when merging ranges.
+COALESCE_GAP = 16
+
+RETRY_LIMIT = 3
+RETRY_BACKOFF = 0.05
+
+# ATR header, manufacturer and DIR data (bytes 0-29): read before the rest
+# so the chip information can be shown while the card is still being read.
+HEADER_LENGTH = 30
+
+# Pages read on each side of the visible ones when the image is lazy.
+PREFETCH_PAGES = 4
+
+# Reads per chunk in consensus mode; a chunk is accepted once two agree.
+CONSENSUS_READS = 3
+
+# Times a verified write re-sends the bytes that still read back wrong.
+VERIFY_ROUNDS = 2
+
+# Status words that sending the same APDU again cannot fix.
+LENGTH_SW1 = (0x67, 0x6C)
+SECURITY_SW = (0x6982, 0x6983, 0x6985)
+UNSUPPORTED_SW = (0x6A81, 0x6D00, 0x6E00)
+FATAL_SW = SECURITY_SW + UNSUPPORTED_SW
+
+
+class ApduError(Exception):
+
+    def __init__(self, msg: str, sw1: int = 0, sw2: int = 0):
+        super().__init__(msg)
+        self.sw1 = sw1
+        self.sw2 = sw2
+
+
+def transactional(fn):
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        session = self.session
+        if session is None:
+            return fn(self, *args, **kwargs)
+        with session.transaction():
+            return fn(self, *args, **kwargs)
+    return wrapper
+
+
+def verified(fn):
+    """
+    With verify_writes set, collects every range fn writes and reads them
+    back in one coalesced pass when the outermost verified call returns.
+    Nested calls (write_changes -> write_bytes) add to the same batch.
+    """
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        if not self.verify_writes or self._unverified is not None:
+            return fn(self, *args, **kwargs)
+        self._unverified = []
+        try:
+            result = fn(self, *args, **kwargs)
+            self._verify_written()
+            return result
+        finally:
+            self._unverified = None
+    return wrapper
 
 
 class BaseCard:
 
+    # SELECT code of the card type on readers that need one.
+    card_code = None
+
     def __init__(self, conn, logger=None):
         self.conn = conn
         self.log = logger if logger else (lambda msg: None)
         self.size = 0
         self.main_memory: list[int] = []
         self.protection_memory: list[int] = []
+        self.protection_bits = ProtectionMap(0)
+        # Replaced by the session's cache once the card is attached.
+        self.cache = CardStateCache()
         self.security_memory: list[int] = []
         self.is_authenticated: bool = False
+        self.auth_psc = None
+        self.session = None
+        self.sink = None
+        self.profile = ACS_PROFILE
+        self.stats = None
+        self.last_sw = (0, 0)
+
+        self.read_chunk = READ_CHUNK_STEPS[0]
+        self.write_chunk = WRITE_CHUNK_STEPS[0]
+        self.on_caps_changed = None
+        self.on_progress = None
+        # on_chunk(addr, data) receives a full-card read piece by piece.
+        self.on_chunk = None
+        self._confirmed_caps = {"read_chunk": None, "write_chunk": None}
+        # Chunk kinds last stepped down by a transient error rather than a
+        # length status word: honoured for this session, never saved.
+        self._session_caps: set[str] = set()
+
+        self.max_retries = RETRY_LIMIT
+        self.retry_backoff = RETRY_BACKOFF
+        self.shrink_on_retry = True
+        self.coalesce_gap = COALESCE_GAP
+        self._resume = {}
+        # Bumped by forget_card; part of every resume key, so a transfer
+        # saved for one card can never be resumed on another.
+        self.card_epoch = 0
+        # Set once read_all has filled main_memory; write planning only
+        # diffs against the card image after that.
+        self.memory_loaded = False
+        # A lazy image (begin_lazy) is filled page by page; loaded_pages
+        # holds the addresses of the pages read so far.
+        self.page_size = 16
+        self.pages: list[Page16] = []
+        self.loaded_pages: set[int] = set()
+
+        # Above 1, read_range reads each chunk until two reads agree, see _agree.
+        self.consensus_reads = 1
+        # addr -> length of chunks whose reads never agreed.
+        self.unstable: dict[int, int] = {}
+
+        # Opt-in read-back of written ranges, see verified.
+        self.verify_writes = False
+        self.verify_rounds = VERIFY_ROUNDS
+        self._unverified = None
 
     def _log(self, text: str):
         self.log(text)
@@ -18,62 +147,596 @@ class BaseCard:
     def _hex(self, arr) -> str:
         return " ".join(f"{b:02X}" for b in arr)
 
-    def tx(self, apdu, desc: str = ""):
-        self._log(f"<< {tr('log.apdu_send')} ({desc}): {self._hex(apdu)}")
+    def _emit(self, event: ApduEvent):
+        if self.sink is not None:
+            self.sink.event(event)
+        else:
+            self._log(event.render())
+
+    def _stats_ins(self, apdu) -> int:
+        return apdu[1] if len(apdu) > 1 else 0
+
+    def _transmit(self, apdu):
+        start = time.perf_counter()
+        try:
+            data, sw1, sw2 = self.conn.transmit(apdu)
+        except Exception:
+            if self.stats is not None:
+                duration = time.perf_counter() - start
+                self.stats.record(type(self).__name__, self._stats_ins(apdu), duration, len(apdu), 0, False)
+            raise
+        duration = time.perf_counter() - start
+        if self.stats is not None:
+            self.stats.record(
+                type(self).__name__, self._stats_ins(apdu), duration,
+                len(apdu), len(data) + 2, sw1 == 0x90,
+            )
+        return data, sw1, sw2, duration
+
+    def tx(self, apdu, desc=""):
+        trace = self.sink is None or self.sink.enabled(DEBUG)
+        if trace:
+            self._emit(ApduEvent(SEND, apdu, desc=desc))
 
-        data, sw1, sw2 = self.conn.transmit(apdu)
+        data, sw1, sw2, duration = self._transmit(apdu)
+        self.last_sw = (sw1, sw2)
 
         if sw1 != 0x90:
-            msg_tr = tr("log.sw_error")
-            msg = f"{msg_tr} SW={sw1:02X}{sw2:02X} in {desc}"
-            self._log(f">> {msg}")
-            raise Exception(msg)
+            self._emit(ApduEvent(FAIL, apdu, None, sw1, sw2, duration, desc, ERROR))
+            msg = f"{tr('log.sw_error')} SW={sw1:02X}{sw2:02X} in {render_desc(desc)}"
+            raise ApduError(msg, sw1, sw2)
 
-        if data:
-            self._log(f">> {tr('log.apdu_recv')} DATA: {self._hex(data)}")
-        else:
-            self._log(f">> {tr('log.sw_ok')}")
+        if trace:
+            self._emit(ApduEvent(RECV, apdu, data, sw1, sw2, duration, desc))
 
         return data
 
+    def set_profile(self, profile):
+        self.profile = profile
+        self.read_chunk = min(self.read_chunk, profile.max_read)
+        self.write_chunk = min(self.write_chunk, profile.max_write)
+
+    def set_chunk_sizes(self, read_chunk: int = None, write_chunk: int = None):
+        if read_chunk:
+            self.read_chunk = min(int(read_chunk), self.profile.max_read)
+            self._confirmed_caps["read_chunk"] = self.read_chunk
+        if write_chunk:
+            self.write_chunk = min(int(write_chunk), self.profile.max_write)
+            self._confirmed_caps["write_chunk"] = self.write_chunk
+
+    def _confirm_chunk(self, kind: str, size: int):
+        if self._confirmed_caps.get(kind) == size:
+            return
+        self._confirmed_caps[kind] = size
+        if kind in self._session_caps:
+            return
+        if self.on_caps_changed:
+            try:
+                self.on_caps_changed(self)
+            except Exception:
+                pass
+
+    def persistent_caps(self) -> dict:
+        """Chunk sizes worth saving for the reader; None for session-only ones."""
+        return {
+            kind: None if kind in self._session_caps else getattr(self, kind)
+            for kind in ("read_chunk", "write_chunk")
+        }
+
+    def _report_progress(self, done: int, total: int):
+        if self.on_progress:
+            self.on_progress(done, total)
+
+    @staticmethod
+    def _next_step(steps, current: int):
+        for s in steps:
+            if s < current:
+                return s
+        return None
+
+    @staticmethod
+    def _length_rejected(exc: Exception) -> bool:
+        return isinstance(exc, ApduError) and exc.sw1 in LENGTH_SW1
+
+    @staticmethod
+    def _fatal(exc: Exception) -> bool:
+        return isinstance(exc, ApduError) and ((exc.sw1 << 8) | exc.sw2) in FATAL_SW
+
+    @staticmethod
+    def _denied(exc: Exception) -> bool:
+        return isinstance(exc, ApduError) and ((exc.sw1 << 8) | exc.sw2) in SECURITY_SW
+
+    @staticmethod
+    def _unsupported(exc: Exception) -> bool:
+        return isinstance(exc, ApduError) and ((exc.sw1 << 8) | exc.sw2) in UNSUPPORTED_SW
+
+    def _retry(self, exc: Exception, attempt: int) -> bool:
+        """
+        Decides whether a failed APDU is worth sending again and waits with
+        exponential backoff. Anything other than a bad status word means the
+        link dropped: the card is warm-reset through the session first.
+        """
+        if attempt >= self.max_retries:
+            return False
+        if self._length_rejected(exc) or self._fatal(exc):
+            return False
+
+        self._log(f"{tr('log.retry')} {attempt + 1}/{self.max_retries}: {exc}")
+        time.sleep(self.retry_backoff * (2 ** attempt))
+        if isinstance(exc, ApduError):
+            return True
+        return self._reconnect()
+
+    def _retry_size(self, chunk: int, attempt: int) -> int:
+        if self.shrink_on_retry and attempt > 1 and chunk > 1:
+            return chunk // 2
+        return chunk
+
+    def _reconnect(self) -> bool:
+        session = self.session
+        if session is None:
+            return False
+        try:
+            return session.recover() and session.card is self
+        except Exception as exc:
+            self._log(f"{tr('log.reconnect_failed')}: {exc}")
+            return False
+
+    def _with_retry(self, fn, *args):
+        attempt = 0
+        while True:
+            try:
+                return fn(*args)
+            except Exception as exc:
+                if not self._retry(exc, attempt):
+                    raise
+                attempt += 1
+
+    def _resume_key(self, *parts):
+        return (self.card_epoch,) + parts
+
+    def _resume_point(self, kind: str, key):
+        pending = self._resume.pop(kind, None)
+        if pending is None or pending[0] != key:
+            return None
+        return pending[1]
+
+    def _save_resume(self, kind: str, key, state):
+        self._resume[kind] = (key, state)
+
+    def _step_down(self, kind: str, steps, exc: Exception) -> bool:
+        if not isinstance(exc, ApduError) or self._fatal(exc):
+            return False
+        current = getattr(self, kind)
+        smaller = self._next_step(steps, current)
+        if smaller is None:
+            return False
+        setattr(self, kind, smaller)
+        if self._length_rejected(exc):
+            self._session_caps.discard(kind)
+        else:
+            self._session_caps.add(kind)
+        self._log(f"{tr('log.chunk_step_down')} {kind}: {current} → {smaller} ({exc})")
+        return True
+
+    def run_plan(self, plan, start: int = 0, stop: int = None):
+        """
+        Sends the steps of a precompiled ApduPlan from index start up to
+        stop and returns (payload, steps completed). Stops quietly at the
+        first step that fails or answers short, so the caller can continue
+        from there with its retrying loop.
+        """
+        out: list[int] = []
+        steps = plan.steps
+        stop = len(steps) if stop is None else min(stop, len(steps))
+        covered = sum(step.length for step in steps[:start])
+        tx = self.tx
+        for i in range(start, stop):
+            step = steps[i]
+            try:
+                data = tx(step.wire, step.desc)
+            except Exception:
+                return out, i - start
+            if step.expect:
+                payload = data[step.skip:step.skip + step.expect]
+                out.extend(payload)
+                if len(payload) < step.expect:
+                    return out, i - start
+            covered += step.length
+            self._report_progress(covered, plan.total)
+        return out, max(0, stop - start)
+
+    def _store_written(self, addr: int, data):
+        self._mark_written(addr, data)
+        for i, b in enumerate(data):
+            idx = addr + i
+            if 0 <= idx < len(self.main_memory):
+                self.main_memory[idx] = b
+
+    def _mark_written(self, addr: int, data):
+        pending = self._unverified
+        if pending is None or not len(data):
+            return
+        if pending and pending[-1][0] + len(pending[-1][1]) == addr:
+            pending[-1][1].extend(data)
+        else:
+            pending.append((addr, list(data)))
+
+    def _verify_written(self):
+        """
+        Reads back the ranges written since the batch opened, compares
+        them with what was sent and re-sends only the bytes that differ,
+        up to verify_rounds times.
+        """
+        pending = self._unverified
+        for attempt in range(self.verify_rounds + 1):
+            if not pending:
+                return
+            total = sum(len(d) for _, d in pending)
+            got = self.read_ranges([(a, len(d)) for a, d in pending])
+
+            bad = []
+            for (addr, data), current in zip(pending, got):
+                for i, b in enumerate(current):
+                    if 0 <= addr + i < len(self.main_memory):
+                        self.main_memory[addr + i] = b
+                for kind, start, length in diff_runs(current, data):
+                    if kind == WRITE:
+                        bad.append((addr + start, data[start:start + length]))
+
+            bad_bytes = sum(len(d) for _, d in bad)
+            self._log(f"{tr('log.verify_written')}: {total - bad_bytes}/{total}")
+            if not bad or attempt == self.verify_rounds:
+                break
+            self._log(f"{tr('log.verify_rewrite')}: {len(bad)} {tr('label.ranges')}, {bad_bytes} bytes")
+            self._unverified = []
+            for addr, data in bad:
+                self.write_bytes(addr, data)
+            pending = bad
+
+        if bad:
+            failed = [a + i for a, d in bad for i in range(len(d))]
+            shown = ", ".join(f"{a:04X}" for a in failed[:16])
+            raise Exception(f"{tr('error.verify_failed')}: {shown}{' …' if len(failed) > 16 else ''}")
+
+    def _await_write(self, addr: int, data) -> list[int]:
+        """
+        Reads back bytes just written until they match or the profile's
+        write_settle runs out, and returns what the card holds. Replaces
+        a fixed sleep: most writes are readable on the first poll.
+        """
+        expected = list(data)
+        if not self.profile.write_settle:
+            return expected
+        apdu = self.profile.read(addr, len(expected))
+        deadline = time.perf_counter() + self.profile.write_settle
+        while True:
+            try:
+                current = self.tx(apdu, ("log.write_poll", addr, len(expected)))[:len(expected)]
+            except ApduError:
+                current = None
+            if current == expected:
+                return current
+            if time.perf_counter() >= deadline:
+                self._log(f"{tr('log.write_unconfirmed')} [{addr}:{len(expected)}]")
+                return current if current and len(current) == len(expected) else expected
+            time.sleep(self.profile.write_poll)
+
+    def _agree(self, read, addr: int, length: int) -> list[int]:
+        """
+        Calls read() up to consensus_reads times and returns the first
+        result two reads agree on. A chunk that never stabilises is
+        flagged in unstable and resolved by a per-byte majority vote.
+        """
+        if self.consensus_reads <= 1:
+            return read()
+        votes = []
+        for _ in range(self.consensus_reads):
+            data = list(read())
+            if data in votes:
+                for a in [a for a in self.unstable if addr <= a < addr + length]:
+                    del self.unstable[a]
+                return data
+            votes.append(data)
+
+        self.unstable[addr] = length
+        self._log(f"{tr('log.read_unstable')} [{addr}:{length}] ({len(votes)})")
+        full = [v for v in votes if len(v) == length] or votes
+        return [Counter(col).most_common(1)[0][0] for col in zip(*full)]
+
     def read_range(self, addr: int, length: int) -> list[int]:
-        result: list[int] = []
-        pos = addr
-        remaining = length
+        if self.consensus_reads <= 1:
+            return self._read_range(addr, length)
+
+        key = self._resume_key(addr, length)
+        result: list[int] = self._resume_point("consensus", key) or []
+        while len(result) < length:
+            pos = addr + len(result)
+            n = min(self.read_chunk, length - len(result))
+            try:
+                result.extend(self._agree(lambda: self._read_range(pos, n), pos, n))
+            except Exception:
+                self._save_resume("consensus", key, result)
+                raise
+            self._report_progress(len(result), length)
+        return result
+
+    def _read_range(self, addr: int, length: int) -> list[int]:
+        key = self._resume_key(addr, length)
+        result: list[int] = self._resume_point("read", key) or []
+        if result:
+            self._log(f"{tr('log.resume_transfer')} {addr + len(result)}")
+        else:
+            plan = compile_read(type(self).__name__, addr, length, self.read_chunk, self.profile.name)
+            result, done = self.run_plan(plan)
+            if done == len(plan):
+                if length >= self.read_chunk:
+                    self._confirm_chunk("read_chunk", self.read_chunk)
+                return result
+            # The loop below resends the step that stopped the plan, with
+            # retries and chunk step-down.
+        pos = addr + len(result)
+        remaining = length - len(result)
+        entry_chunk = self.read_chunk
+        attempt = 0
+        retry_chunk = None
 
         while remaining > 0:
-            chunk = min(remaining, 240)
-            apdu = [0xFF, 0xB0, 0x00, pos & 0xFF, chunk]
-            data = self.tx(apdu, f"{tr('log.read_chunk')}[{pos}:{chunk}]")
+            chunk = min(remaining, retry_chunk or self.read_chunk)
+            apdu = self.profile.read(pos, chunk)
+            try:
+                data = self.tx(apdu, ("log.read_chunk", pos, chunk))
+            except Exception as exc:
+                if self._length_rejected(exc) and self._step_down("read_chunk", READ_CHUNK_STEPS, exc):
+                    continue
+                if self._retry(exc, attempt):
+                    attempt += 1
+                    retry_chunk = self._retry_size(chunk, attempt)
+                    continue
+                if self._step_down("read_chunk", READ_CHUNK_STEPS, exc):
+                    attempt = 0
+                    retry_chunk = None
+                    continue
+                self.read_chunk = self._confirmed_caps["read_chunk"] or entry_chunk
+                self._save_resume("read", key, result)
+                raise
 
             if not data:
                 raise Exception(tr("msg.error_card_read"))
 
+            attempt = 0
+            retry_chunk = None
             result.extend(data)
 
             real = len(data)
             if real < chunk:
+                if pos + real < self.size:
+                    self.read_chunk = real
+                    self._confirm_chunk("read_chunk", real)
                 remaining -= real
                 pos += real
+                self._report_progress(length - remaining, length)
                 continue
 
+            if chunk == self.read_chunk:
+                self._confirm_chunk("read_chunk", chunk)
+
             remaining -= chunk
             pos += chunk
+            self._report_progress(length - remaining, length)
 
         return result
 
+    @transactional
+    def read_ranges(self, ranges) -> list[list[int]]:
+        """
+        Reads many (addr, length) ranges at once. Ranges that are adjacent,
+        overlapping or close together are fetched with a single read of at
+        most read_chunk bytes; results come back in the order requested.
+        """
+        ranges = [(int(a), int(n)) for a, n in ranges]
+        spans = coalesce_ranges(ranges, self.read_chunk, self.coalesce_gap)
+
+        fetched = []
+        for start, length in spans:
+            fetched.append((start, self.read_range(start, length)))
+
+        out = []
+        for addr, length in ranges:
+            for start, data in fetched:
+                if start <= addr and addr + length <= start + len(data):
+                    out.append(list(data[addr - start:addr - start + length]))
+                    break
+            else:
+                out.append([])
+
+        for start, data in fetched:
+            for i, b in enumerate(data):
+                if start + i < len(self.main_memory):
+                    self.main_memory[start + i] = b
+        return out
+
+    def page_loaded(self, addr: int) -> bool:
+        return self.memory_loaded or addr - addr % self.page_size in self.loaded_pages
+
+    def _image_known(self, addr: int, length: int) -> bool:
+        """True when main_memory holds what the card has for these bytes."""
+        if self.memory_loaded:
+            return True
+        ps = self.page_size
+        return all(a in self.loaded_pages for a in range(addr - addr % ps, addr + length, ps))
+
+    def begin_lazy(self):
+        """Starts an empty image that read_pages and ensure_pages fill on demand."""
+        self.main_memory[:] = [0xFF] * self.size
+        self.memory_loaded = False
+        self.loaded_pages.clear()
+        self.pages.clear()
+
+    def read_page(self, addr_from: int) -> Page16:
+        return self.read_pages([addr_from])[0]
+
+    def read_pages(self, addrs) -> list[Page16]:
+        for addr_from in addrs:
+            if addr_from % self.page_size != 0:
+                raise ValueError(tr("error.addr_not_mult_16"))
+
+        results = self.read_ranges([(a, self.page_size) for a in addrs])
+
+        pages = []
+        for addr_from, data in zip(addrs, results):
+            page = next((p for p in self.pages if p.addr_from == addr_from), None)
+            if page is None:
+                page = Page16(addr_from, data)
+                self.pages.append(page)
+            else:
+                page.data = data[:]
+                page.dirty = False
+            self.loaded_pages.add(addr_from)
+            pages.append(page)
+        return pages
+
+    @transactional
+    def ensure_pages(self, first: int, last: int, prefetch: int = PREFETCH_PAGES) -> list[Page16]:
+        """
+        Reads the pages covering bytes first..last that are not loaded yet,
+        then the missing ones among prefetch pages on each side. Each run
+        of pages goes to on_chunk as soon as it is read, so what is on
+        screen arrives before the neighbours.
+        """
+        if last < first:
+            return []
+        ps = self.page_size
+        lo = max(0, first - first % ps)
+        hi = min(last, self.size - 1)
+        hi -= hi % ps
+        visible = range(lo, hi + 1, ps)
+        near = [*range(lo - prefetch * ps, lo, ps), *range(hi + ps, hi + ps + prefetch * ps, ps)]
+
+        read = []
+        for group in (visible, near):
+            missing = [a for a in group if 0 <= a < self.size and not self.page_loaded(a)]
+            if not missing:
+                continue
+            pages = self.read_pages(missing)
+            read.extend(pages)
+            if self.on_chunk:
+                for start, n in index_runs(a // ps for a in missing):
+                    self.on_chunk(start * ps, list(self.main_memory[start * ps:(start + n) * ps]))
+
+        if len(self.loaded_pages) * ps >= self.size:
+            self.memory_loaded = True
+        return read
+
+    def complete_image(self) -> list[int]:
+        """Reads every page a lazy image still lacks."""
+        self.ensure_pages(0, self.size - 1, 0)
+        return list(self.main_memory)
+
+    @transactional
     def read_all(self) -> list[int]:
         if self.size <= 0:
             raise Exception(tr("msg.error_card_read"))
 
         self._log(f"{tr('log.read_full')} ({self.size} bytes)…")
-        data = self.read_range(0, self.size)
+        data = self._read_image(self.read_range)
         self.main_memory = data
+        self.memory_loaded = True
         return data
 
+    def _image_piece(self, sent: int) -> int:
+        return HEADER_LENGTH if sent == 0 else self.read_chunk
+
+    def _read_image(self, read) -> list[int]:
+        """
+        Reads the whole card through read(addr, length): the header first,
+        then read_chunk pieces, each handed to on_chunk as it arrives. The
+        header read costs no extra APDU, it only moves the chunk bounds.
+        A failed read resumes after the pieces already received.
+        """
+        key = self._resume_key(self.size)
+        out: list[int] = self._resume_point("image", key) or []
+        while len(out) < self.size:
+            pos = len(out)
+            try:
+                data = list(read(pos, min(self._image_piece(pos), self.size - pos)))
+            except Exception:
+                self._save_resume("image", key, out)
+                raise
+            out.extend(data)
+            if self.on_chunk:
+                self.on_chunk(pos, data)
+        return out
+
+    def _stream(self, sent: int, upto: int) -> int:
+        """
+        For drivers that fill main_memory a byte at a time: hands on
+        main_memory[sent:upto] once a header or read_chunk piece is
+        complete and returns the new start of the unsent part.
+        """
+        if upto <= sent:
+            return sent
+        if upto < self.size and upto - sent < self._image_piece(sent):
+            return sent
+        # The piece bounds advance with or without a listener: callers size
+        # their next batch from the returned start.
+        if self.on_chunk is not None:
+            self.on_chunk(sent, list(self.main_memory[sent:upto]))
+        return upto
+
+    def _forget_reads(self):
+        # Partial reads saved for resuming are stale once the card is written.
+        for kind in ("read", "consensus", "image"):
+            self._resume.pop(kind, None)
+
+    def fingerprint(self):
+        """Header bytes already read from this card, or None."""
+        if not self._image_known(0, HEADER_LENGTH):
+            return None
+        return list(self.main_memory[:HEADER_LENGTH])
+
+    def read_fingerprint(self) -> list[int]:
+        """
+        Reads the header again, bypassing saved partial transfers. It holds
+        the IC serial number, so it tells two cards with one ATR apart.
+        """
+        if self.card_code is not None:
+            self._select(self.card_code)
+        apdu = self.profile.read(0, HEADER_LENGTH)
+        return list(self.tx(apdu, ("log.read_chunk", 0, HEADER_LENGTH))[:HEADER_LENGTH])
+
+    def forget_card(self):
+        """
+        Drops everything that belongs to the physical card rather than to
+        the reader: another card of the same type may be in it now.
+        """
+        self.card_epoch += 1
+        self.is_authenticated = False
+        self.auth_psc = None
+        self._resume.clear()
+        self.memory_loaded = False
+        self.loaded_pages.clear()
+        self.pages.clear()
+        self.unstable.clear()
+        self.protection_bits = ProtectionMap(len(self.protection_bits))
+
+    def _select(self, card_code: int):
+        if self.cache.get("select") == card_code:
+            return
+        apdu = self.profile.select(card_code)
+        if apdu is None:
+            return
+        self.tx(apdu, ("log.select_file",))
+        self.cache.put("select", card_code)
+
     def read_security_memory(self) -> list[int]:
-        apdu = [0xFF, 0xB1, 0x00, 0x00, 4]
-        data = self.tx(apdu, tr("log.read_security"))
+        data = self.cache.get("security")
+        if data is None:
+            apdu = self.profile.read_security()
+            if apdu is None:
+                raise Exception(f"{tr('error.profile_unsupported')}: {self.profile.label}")
+            data = self.tx(apdu, ("log.read_security",))
+            self.cache.put("security", data)
         self.security_memory = list(data)
         return self.security_memory
 
@@ -81,25 +744,37 @@ class BaseCard:
         if len(psc) != 3:
             raise ValueError(tr("error.pin_must_be_3bytes"))
 
-        try:
-            sm_before = self.read_security_memory()
-            counter_before = sm_before[0]
-            self._log(f"{tr('log.security_before_auth')}: {counter_before}")
-            if counter_before == 0:
-                raise Exception(tr("error.card_is_locked"))
-        except Exception as e:
-            self._log(f"{tr('error.cannot_guess_pin')} {e}")
-
-        apdu = [0xFF, 0x20, 0x00, 0x00, 3] + list(psc)
+        # Readers without a security-memory read (HID) only report the
+        # verify status word; there is no counter to check around it.
+        has_security = self.profile.read_security() is not None
+        if has_security:
+            try:
+                sm_before = self.read_security_memory()
+                counter_before = sm_before[0]
+                self._log(f"{tr('log.security_before_auth')}: {counter_before}")
+                if counter_before == 0:
+                    raise Exception(tr("error.card_is_locked"))
+            except Exception as e:
+                self._log(f"{tr('error.cannot_guess_pin')} {e}")
+
+        apdu = self.profile.verify(psc)
         self._log(f"<< AUTH: {self._hex(apdu)}")
-        data, sw1, sw2 = self.conn.transmit(apdu)
+        data, sw1, sw2, _ = self._transmit(apdu)
         self._log(f">> SW={sw1:02X}{sw2:02X}")
+        # Verify always moves the error counter.
+        self.cache.drop("security")
 
-        if sw1 != 0x90:
+        if sw1 != 0x90 or (not has_security and sw2 != 0x00):
             msg = f"{tr('error.auth_failed')}{sw1:02X}{sw2:02X}"
             self._log(msg)
             raise Exception(msg)
 
+        if not has_security:
+            self.is_authenticated = True
+            self.auth_psc = list(psc)
+            self._log(tr("log.auth_ok"))
+            return
+
         sm_after = self.read_security_memory()
         self.security_memory = list(sm_after)
         counter_after = sm_after[0]
@@ -107,6 +782,7 @@ class BaseCard:
 
         if stored_psc == list(psc):
             self.is_authenticated = True
+            self.auth_psc = list(psc)
             self._log(
                 f"{tr('log.auth_ok')}. {tr('log.security_counter')}={counter_after}"
             )
@@ -127,13 +803,17 @@ class BaseCard:
         if not self.is_authenticated:
             raise Exception(tr("msg.psc_required"))
 
-        apdu = [0xFF, 0xD2, 0x00, 0x01, 3] + list(new_psc)
-        self.tx(apdu, tr("log.change_psc_ok"))
+        apdu = self.profile.change_psc(self.auth_psc or [], new_psc)
+        self.tx(apdu, ("log.change_psc_ok",))
 
         counter = self.security_memory[0] if self.security_memory else 0
         self.security_memory = [counter] + list(new_psc)
+        self.cache.put("security", self.security_memory)
+        self.auth_psc = list(new_psc)
         self._log(tr("log.change_psc_ok"))
 
+    @transactional
+    @verified
     def write_bytes(self, addr: int, data):
         if not self.is_authenticated:
             raise Exception(tr("msg.write_blocked"))
@@ -143,41 +823,189 @@ class BaseCard:
         if not data:
             return
 
-        max_chunk = 16
+        key = self._resume_key(addr, bytes(data))
         total_len = len(data)
-        offset = 0
+        offset = self._resume_point("write", key) or 0
+        if offset:
+            self._log(f"{tr('log.resume_transfer')} {addr + offset}")
+        self._forget_reads()
+        if not offset:
+            plan = compile_write(type(self).__name__, addr, data, self.write_chunk, self.profile.name)
+            _, done = self.run_plan(plan)
+            offset = sum(step.length for step in plan.steps[:done])
+            self._store_written(addr, data[:offset])
+            if done == len(plan):
+                if total_len >= self.write_chunk:
+                    self._confirm_chunk("write_chunk", self.write_chunk)
+                return
+
+        entry_chunk = self.write_chunk
+        attempt = 0
+        retry_chunk = None
 
         while offset < total_len:
-            chunk = list(data[offset:offset + max_chunk])
+            chunk = list(data[offset:offset + (retry_chunk or self.write_chunk)])
             chunk_len = len(chunk)
             current_addr = addr + offset
 
-            apdu = [0xFF, 0xD0, 0x00, current_addr & 0xFF, chunk_len] + chunk
-            self.tx(apdu, f"{tr('log.write_chunk')}[{current_addr}:{chunk_len}]")
+            apdu = self.profile.write(current_addr, chunk)
+            try:
+                self.tx(apdu, ("log.write_chunk", current_addr, chunk_len))
+            except Exception as exc:
+                if self._length_rejected(exc) and self._step_down("write_chunk", WRITE_CHUNK_STEPS, exc):
+                    continue
+                if self._retry(exc, attempt):
+                    attempt += 1
+                    retry_chunk = self._retry_size(chunk_len, attempt)
+                    continue
+                if self._step_down("write_chunk", WRITE_CHUNK_STEPS, exc):
+                    attempt = 0
+                    retry_chunk = None
+                    continue
+                self.write_chunk = self._confirmed_caps["write_chunk"] or entry_chunk
+                self._save_resume("write", key, offset)
+                raise
+
+            attempt = 0
+            retry_chunk = None
+            if chunk_len == self.write_chunk:
+                self._confirm_chunk("write_chunk", chunk_len)
 
-            for i, b in enumerate(chunk):
-                idx = current_addr + i
-                if 0 <= idx < len(self.main_memory):
-                    self.main_memory[idx] = b
+            self._store_written(current_addr, chunk)
 
             offset += chunk_len
+            self._report_progress(offset, total_len)
+
+    def is_protected(self, addr: int) -> bool:
+        return 0 <= addr < len(self.protection_bits) and self.protection_bits[addr]
+
+    def is_writable(self, addr: int) -> bool:
+        return 0 <= addr < self.size
+
+    def plan_write(self, addr: int, data) -> WritePlan:
+        if not self.protection_loaded:
+            # Locked bytes must be known before diffing, or the plan (and a
+            # dry run) would try to write them.
+            self._load_protection(range(addr, addr + len(data)))
+        if self.memory_loaded:
+            return plan_writes(self.main_memory, data, addr, self.is_protected, self.is_writable)
+        if self.loaded_pages:
+            # Lazy image: only pages already read can be diffed or written.
+            writable = lambda a: self.is_writable(a) and self.page_loaded(a)
+            return plan_writes(self.main_memory, data, addr, self.is_protected, writable)
+        return plan_writes(None, data, addr, self.is_protected, self.is_writable)
+
+    @transactional
+    @verified
+    def write_changes(self, data, addr: int = 0, dry_run: bool = False) -> WritePlan:
+        """
+        Writes only the bytes of data that differ from the card image,
+        one write_bytes call per changed range. Protected bytes are left
+        out and reported in the returned plan; dry_run sends nothing.
+        """
+        plan = self.plan_write(addr, data)
+        self._log(plan.summary())
+        if dry_run:
+            return plan
+        for start, chunk in plan.ranges:
+            self.write_bytes(start, chunk)
+        return plan
+
+    @property
+    def protection_loaded(self) -> bool:
+        return self.cache.has("protection")
 
     def read_protection_memory(self) -> list[int]:
-        apdu = [0xFF, 0xB2, 0x00, 0x00, 4]
-        data = self.tx(apdu, tr("log.read_pm"))
-        self.protection_memory = data
-        return data
+        pm = self.cache.get("protection")
+        if pm is None:
+            pm = self._fetch_protection()
+        self._decode_protection(pm)
+        return list(pm)
+
+    def _fetch_protection(self) -> list[int]:
+        apdu = self.profile.read_protection(0, 4)
+        return self.tx(apdu, ("log.read_pm",))
+
+    def _decode_protection(self, pm):
+        self.protection_memory = list(pm)
+        self.protection_bits = ProtectionMap.from_pm(pm, len(self.protection_bits) or None)
+        self.cache.put("protection", pm)
+
+    def _load_protection(self, indices):
+        self.read_protection_memory()
+
+    def _protect_data(self, runs) -> list[list[int]]:
+        # Compare-and-protect needs the current content; without a full
+        # image only the bytes being protected are read.
+        if self.memory_loaded:
+            return [list(self.main_memory[s:s + n]) for s, n in runs]
+        return [list(data) for data in self.read_ranges(runs)]
+
+    def _protect_run(self, start: int, data):
+        pos = 0
+        while pos < len(data):
+            chunk = data[pos:pos + self.write_chunk]
+            apdu = self.profile.compare_and_protect(start + pos, chunk)
+            self._with_retry(self.tx, apdu, ("log.protect", start + pos, len(chunk)))
+            pos += len(chunk)
+
+    def _refresh_protection(self, runs):
+        """Reads back only the protection-memory bytes covering runs."""
+        spans = coalesce_ranges(
+            [(s // 8, (s + n + 7) // 8 - s // 8) for s, n in runs], self.profile.max_read, self.coalesce_gap
+        )
+        for byte, n in spans:
+            apdu = self.profile.read_protection_at(byte * 8, n)
+            pm = self._with_retry(self.tx, apdu, ("log.read_pm_range", byte * 8, n * 8))
+            self.protection_bits.load_pm(byte * 8, pm)
+        self.protection_memory = list(self.protection_bits.to_pm())
+        self.cache.put("protection", self.protection_memory)
+
+    @transactional
+    def set_protection_bits(self, indices):
+        """
+        Protects the given bytes with one compare-and-protect per run of
+        consecutive unprotected bytes, then verifies just those bits.
+        """
+        if not self.is_authenticated:
+            raise Exception(tr("msg.psc_required"))
+        self._load_protection(indices)
+
+        runs = index_runs(self.protection_bits.missing(indices))
+        if not runs:
+            return
+
+        rounds = self.verify_rounds if self.verify_writes else 0
+        for attempt in range(rounds + 1):
+            for (start, _), data in zip(runs, self._protect_data(runs)):
+                self._protect_run(start, data)
+            self._refresh_protection(runs)
+
+            failed = [a for s, n in runs for a in range(s, s + n) if not self.protection_bits[a]]
+            if not failed or attempt == rounds:
+                break
+            # Only the bits that did not take are sent again.
+            runs = index_runs(failed)
+            self._log(f"{tr('log.verify_rewrite')}: {len(runs)} {tr('label.ranges')}, {len(failed)} bytes")
+        if failed:
+            shown = ", ".join(f"{a:04X}" for a in failed[:16])
+            raise Exception(f"{tr('error.protection_not_set')}: {shown}{' …' if len(failed) > 16 else ''}")
 
     def protect_byte(self, addr: int):
-        raise NotImplementedError(tr("log.write_protected"))
+        if not 0 <= addr < len(self.protection_bits):
+            raise ValueError(tr("error.invalid_address"))
+        self.set_protection_bits([addr])
     
     def ensure_authenticated(self, main):
         
         if getattr(self, "is_authenticated", False):
             return True
 
-        sm = self.read_security_memory()
-        chv = sm[0]
+        # Without a security-memory read (HID) there is no counter to
+        # check; the PSC prompt alone decides.
+        chv = None
+        if self.profile.read_security() is not None:
+            chv = self.read_security_memory()[0]
 
         if self.__class__.__name__ == "SLE4428":
             if chv == 0x7F:
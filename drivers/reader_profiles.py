@@ -0,0 +1,166 @@
+from drivers.acr_commands import (
+    ACS,
+    HID,
+    build_hid_read,
+    build_hid_write,
+    build_hid_read_protection,
+    build_hid_compare_and_protect,
+    build_hid_verify,
+    build_hid_change_psc,
+)
+
+
+class ReaderProfile:
+    """
+    Command set and limits of one reader family. Drivers ask the profile
+    for the APDU of a logical operation instead of hard-coding the ACS
+    pseudo-APDUs, so the same transfer code runs on every reader.
+    """
+
+    name = "generic"
+    label = "Generic"
+    name_hints: tuple = ()
+    atr_prefixes: tuple = ()
+
+    max_read = 255
+    max_write = 64
+    # Longest an EEPROM write may take to become readable, and how often
+    # the written bytes are read back while waiting for it.
+    write_settle = 0.2
+    write_poll = 0.005
+    supports_3wire = False
+
+    def matches(self, reader_name: str, atr=None) -> bool:
+        upper = str(reader_name).upper()
+        if any(h in upper for h in self.name_hints):
+            return True
+        atr = list(atr or [])
+        return any(atr[:len(p)] == list(p) for p in self.atr_prefixes)
+
+    def select(self, card_code: int):
+        return None
+
+    def read(self, addr: int, length: int) -> list[int]:
+        raise NotImplementedError
+
+    def write(self, addr: int, data) -> list[int]:
+        raise NotImplementedError
+
+    def read_protection(self, page: int, length: int) -> list[int]:
+        raise NotImplementedError
+
+    def read_protection_at(self, addr: int, length: int) -> list[int]:
+        """length protection-memory bytes covering card bytes from addr on."""
+        raise NotImplementedError
+
+    def read_security(self):
+        return None
+
+    def compare_and_protect(self, addr: int, data) -> list[int]:
+        raise NotImplementedError
+
+    def verify(self, psc) -> list[int]:
+        raise NotImplementedError
+
+    def change_psc(self, old_psc, new_psc) -> list[int]:
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"ReaderProfile({self.name})"
+
+
+class AcsProfile(ReaderProfile):
+    """ACR38/ACR39 pseudo-APDUs for SLE memory cards."""
+
+    name = "acs"
+    label = "ACS"
+    name_hints = ("ACS", "ACR")
+
+    max_read = 255
+    max_write = 64
+    write_settle = 0.2
+    supports_3wire = True
+
+    def select(self, card_code: int):
+        return [0xFF, ACS.SELECT_CARD, 0x00, 0x00, 0x01, card_code]
+
+    def read(self, addr, length):
+        return [0xFF, ACS.READ_BINARY, (addr >> 8) & 0xFF, addr & 0xFF, length]
+
+    def write(self, addr, data):
+        data = list(data)
+        return [0xFF, ACS.WRITE_BINARY, (addr >> 8) & 0xFF, addr & 0xFF, len(data)] + data
+
+    def read_protection(self, page, length):
+        return [0xFF, 0xB2, page, 0x00, length]
+
+    def read_protection_at(self, addr, length):
+        return [0xFF, 0xB2, (addr >> 8) & 0xFF, addr & 0xFF, length]
+
+    def read_security(self):
+        return [0xFF, 0xB1, 0x00, 0x00, 0x04]
+
+    def compare_and_protect(self, addr, data):
+        data = list(data)
+        return [0xFF, 0xD1, (addr >> 8) & 0xFF, addr & 0xFF, len(data)] + data
+
+    def verify(self, psc):
+        return [0xFF, ACS.VERIFY_PSC, 0x00, 0x00, len(psc)] + list(psc)
+
+    def change_psc(self, old_psc, new_psc):
+        return [0xFF, 0xD2, 0x00, 0x01, len(new_psc)] + list(new_psc)
+
+
+class HidProfile(ReaderProfile):
+    """HID OMNIKEY synchronous-card APDUs (no 3-wire pass-through)."""
+
+    name = "hid"
+    label = "HID OMNIKEY"
+    name_hints = ("OMNIKEY", "HID ")
+
+    max_read = 255
+    max_write = 64
+    write_settle = 0.0
+
+    def read(self, addr, length):
+        return build_hid_read(addr, length)
+
+    def write(self, addr, data):
+        return build_hid_write(addr, data)
+
+    def read_protection(self, page, length):
+        return build_hid_read_protection(page * length, length)
+
+    def read_protection_at(self, addr, length):
+        return build_hid_read_protection(addr // 8, length)
+
+    def compare_and_protect(self, addr, data):
+        return build_hid_compare_and_protect(addr, data)
+
+    def verify(self, psc):
+        return build_hid_verify(psc)
+
+    def change_psc(self, old_psc, new_psc):
+        return build_hid_change_psc(old_psc, new_psc)
+
+
+ACS_PROFILE = AcsProfile()
+HID_PROFILE = HidProfile()
+
+PROFILES = {p.name: p for p in (ACS_PROFILE, HID_PROFILE)}
+
+
+def get_profile(name: str) -> ReaderProfile:
+    profile = PROFILES.get(name)
+    if profile is None:
+        raise ValueError(f"Unsupported reader profile: {name}")
+    return profile
+
+
+def select_profile(reader_name, atr=None, override: str = "auto") -> ReaderProfile:
+    if override and override != "auto":
+        return get_profile(override)
+    for profile in (HID_PROFILE, ACS_PROFILE):
+        if profile.matches(reader_name, atr):
+            return profile
+    return ACS_PROFILE
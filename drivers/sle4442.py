@@ -1,20 +1,21 @@
-from .base_card import BaseCard
+from .base_card import BaseCard, transactional
 from model.page16 import Page16
 from model.chipdata import ChipData
+from model.protection_map import ProtectionMap
 from core.language_manager import tr                      
 
 
 class SLE4442(BaseCard):
 
+    card_code = 0x06
+
     def __init__(self, conn, logger=None):
         super().__init__(conn=conn, logger=logger)
         self.size = 256
-        self.page_size = 16
         self.main_memory = [0xFF] * self.size
         self.protection_memory = [0xFF] * 4
-        self.protection_bits: dict[int, bool] = {i: False for i in range(32)}
+        self.protection_bits = ProtectionMap(32)
         self.security_memory = [0, 0xFF, 0xFF, 0xFF]
-        self.pages: list[Page16] = []
         self.atr_header: list[ChipData] = []
         self.atr_data: list[ChipData] = []
         self.dir_data: list[ChipData] = []
@@ -34,10 +35,10 @@ class SLE4442(BaseCard):
         for p in self.pages:
             p.is_ascii = is_ascii
 
+    @transactional
     def read_all(self):
         try:
-            self._log(tr("log.select_file"))                                           
-            self.conn.transmit([0xFF, 0xA4, 0x00, 0x00, 0x01, 0x06])
+            self._select(0x06)
         except Exception:
             pass
 
@@ -46,85 +47,23 @@ class SLE4442(BaseCard):
         self._build_pages_from_memory()
         return raw
 
-    def read_page(self, addr_from: int) -> Page16:
-        if addr_from % self.page_size != 0:
-            raise ValueError(tr("error.addr_not_mult_16"))
-
-        data = self.read_range(addr_from, self.page_size)
-
-        for i, b in enumerate(data):
-            self.main_memory[addr_from + i] = b
-
-        for p in self.pages:
-            if p.addr_from == addr_from:
-                p.data = data[:]
-                p.dirty = False
-                return p
-
-        page = Page16(addr_from, data)
-        self.pages.append(page)
-        return page
-
     def read_bytes(self, addr: int, length: int) -> list[int]:
-        data = self.read_range(addr, length)
-        for i, b in enumerate(data):
-            if addr + i < len(self.main_memory):
-                self.main_memory[addr + i] = b
-        return data
+        return self.read_ranges([(addr, length)])[0]
 
     def read_protection_memory(self) -> list[int]:
         pm = super().read_protection_memory()
-        self._decode_protection_bits(pm)
+        self._log(tr("log.pm_decoded"))
         return pm
 
-    
-    def _decode_protection_bits(self, pm: list[int]):
-        
-        bits_dict: dict[int, bool] = {}
-        idx = 0
-        for byte in pm:
-            mask = 1
-            for _ in range(8):
-                free = (byte & mask) != 0   
-                bits_dict[idx] = not free   
-                mask <<= 1
-                idx += 1
-
-        self.protection_bits = bits_dict
-        self._log(tr("log.pm_decoded"))
-        
-    
+    def _refresh_protection(self, runs):
+        # The whole protection memory is 4 bytes: one read covers any run.
+        self.cache.drop("protection")
+        self.read_protection_memory()
+
     @property
     def protection_bits_list(self):
-        if isinstance(self.protection_bits, dict):
-            out = []
-            last = max(self.protection_bits.keys(), default=-1)
-            for i in range(last + 1):
-                out.append(bool(self.protection_bits.get(i, False)))
-            return out
         return list(self.protection_bits)
 
-    def protect_byte(self, addr: int):
-        if not self.is_authenticated:
-            raise Exception(tr("msg.psc_required"))
-
-        if not (0 <= addr < 32):
-            raise ValueError(tr("error.invalid_address"))
-
-        apdu = [0xFF, 0xD1, 0x00, addr & 0xFF, 0x01, 0xFF]
-        self.tx(apdu, f"{tr('log.protect_byte')}[{addr}]")
-
-        byte_index = addr // 8
-        bit_index = addr % 8
-        if 0 <= byte_index < len(self.protection_memory):
-            old_val = self.protection_memory[byte_index]
-            new_val = old_val & ~(1 << bit_index)
-            self.protection_memory[byte_index] = new_val
-
-        if isinstance(self.protection_bits, dict):
-            self.protection_bits[addr] = True
-
-
     def read_security_memory(self) -> list[int]:
         sm = super().read_security_memory()
         self.security_memory = sm[:]
@@ -298,24 +237,3 @@ class SLE4442(BaseCard):
             15: tr("desc.rfu"),
         }
         return table.get(n, tr("desc.greater_4096"))
-    
-    
-    def set_protection_bits(self, indices: list[int]):
-        if not self.is_authenticated:
-            raise Exception(tr("msg.psc_required"))
-
-        if not indices:
-            return
-
-        for addr in sorted(set(indices)):
-            if 0 <= addr < 32:
-                if isinstance(self.protection_bits, dict):
-                    if self.protection_bits.get(addr, False):
-                        continue
-                self.protect_byte(addr)
-
-        try:
-            pm = super().read_protection_memory()
-            self._decode_protection_bits(pm)
-        except Exception:
-            pass
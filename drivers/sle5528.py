@@ -4,13 +4,16 @@
                                 
 
 from core.language_manager import tr
-from drivers.base_card import BaseCard
+from core.apdu_log import render_desc
+from drivers.base_card import BaseCard, ApduError, HEADER_LENGTH, WRITE_CHUNK_STEPS, transactional, verified
+from drivers.apdu_plan import compile_3w_read, compile_3w_write, compile_3w_protect, compile_read_protection
+from drivers.write_planner import diff_runs, WRITE, LOCKED
+from model.protection_map import ProtectionMap
 from drivers.acr_commands import (
     build_3w_read9,
     build_3w_read8,
     build_3w_write,
     build_3w_verify,
-    build_3w_command,
     FIXED,
 )
 
@@ -18,104 +21,359 @@ from drivers.acr_commands import (
 class SLE5528(BaseCard):
 
 
+    card_code = 0x05
+
     def __init__(self, conn, logger=None):
         super().__init__(conn=conn, logger=logger)
         self.size = 1024
         self.main_memory = bytearray(self.size)
-        self.prot = bytearray(self.size)                                
+        self.protection_bits = ProtectionMap(self.size)
         self.psc = [0xFF, 0xFF]
         self.is_authenticated = False
+        # Cleared the first time the reader refuses READ BINARY on this card;
+        # from then on reads use the per-byte 9-bit 3-wire command.
+        self.bulk_read = True
+        self.bulk_write = True
+        self.eeprom_cycles = 0
+        self.last_write_cycles = 0
 
                                                                
                            
                                                                
-    def _exec_3w(self, label: str, apdu: list, expect_len: int = 0):
-        self._log(f"<< {label}: {self._hex(apdu)}")
-
+    def _exec_3w(self, label, apdu: list, expect_len: int = 0):
         data = self.tx(apdu, label)
         if expect_len > 0:
                                            
             if len(data) < expect_len + 2:
                 error_msg = tr("error.invalid_length")
-                raise Exception(f"{label} {error_msg}")
+                raise ApduError(f"{render_desc(label)} {error_msg}")
             return data[2 : 2 + expect_len]
         return data
 
+    def _stats_ins(self, apdu) -> int:
+        # Every 3-wire command travels in the same pass-through INS; bucket
+        # by the SLE command code carried inside it instead.
+        if len(apdu) > 9 and apdu[1] == 0x70:
+            return (apdu[1] << 8) | (apdu[9] & 0x3F)
+        return super()._stats_ins(apdu)
+
+    def set_profile(self, profile):
+        if not profile.supports_3wire:
+            raise Exception(f"{tr('error.profile_unsupported')}: {profile.label}")
+        super().set_profile(profile)
+
                                                                
                   
                                                                
     def _read9(self, addr: int):
         apdu = build_3w_read9(addr)
-        resp = self._exec_3w(f"{tr('log.read_byte_9')}[{addr}]", apdu, expect_len=2)
+        resp = self._exec_3w(("log.read_byte_9", addr), apdu, expect_len=2)
         return resp
 
     def _read8(self, addr: int):
         apdu = build_3w_read8(addr)
-        resp = self._exec_3w(f"{tr('log.read_byte_8')}[{addr}]", apdu, expect_len=1)
+        resp = self._exec_3w(("log.read_byte_8", addr), apdu, expect_len=1)
         return resp[0]
 
                                                                
                
                                                                
+    def _read_all_bulk(self):
+        self._select(0x05)
+        self.main_memory[:] = bytes(self._read_image(lambda a, n: BaseCard.read_range(self, a, n)))
+        self.read_protection_memory()
+        self.memory_loaded = True
+
+    def _read_protection_bulk(self) -> list[int]:
+        plan = compile_read_protection("SLE5528", 4, 0x20, self.profile.name)
+        pm, done = self.run_plan(plan)
+        for step in plan.steps[done:]:
+            pm[step.addr:] = self._with_retry(self.tx, step.wire, step.desc)
+        return pm
+
+    def read_fingerprint(self) -> list[int]:
+        if self.bulk_read:
+            return super().read_fingerprint()
+        return [self._read9(a)[0] for a in range(HEADER_LENGTH)]
+
+    def _bulk_failed(self, exc: Exception):
+        self.bulk_read = False
+        # One APDU per byte from now on, so bridging a gap never pays off.
+        self.coalesce_gap = 0
+        self._resume.pop("read", None)
+        self._resume.pop("image", None)
+        self._log(f"{tr('log.bulk_read_fallback')}: {exc}")
+
+    @transactional
     def read_all(self):
         self._log(f"{tr('log.read_full')} ({self.size} bytes)…")
 
-        for i in range(self.size):
-            resp = self._read9(i)
-            data_byte = resp[0]
-            prot_bit = resp[1]
+        if self.bulk_read and "read" not in self._resume:
+            try:
+                self._read_all_bulk()
+                return bytes(self.main_memory)
+            except ApduError as exc:
+                if not self._unsupported(exc):
+                    raise
+                self._bulk_failed(exc)
+
+        key = self._resume_key(0, self.size)
+        start = self._resume_point("read", key) or 0
+        if start:
+            self._log(f"{tr('log.resume_transfer')} {start}")
+
+        plan = compile_3w_read("SLE5528", 0, self.size)
+        i = sent = start
+        while i < self.size:
+            # A batched plan cannot be voted on; consensus reads go byte by byte.
+            if self.consensus_reads <= 1:
+                stop = min(sent + self._image_piece(sent), self.size)
+                data, done = self.run_plan(plan, i, stop)
+                for n in range(done):
+                    self._store_read9(i + n, data[2 * n:2 * n + 2])
+                i += done
+                sent = self._stream(sent, i)
+                if i >= stop:
+                    # The piece is complete; only a step the plan stopped
+                    # at goes through the retrying path below.
+                    continue
 
-            self.main_memory[i] = data_byte
-            self.prot[i] = 1 if prot_bit == 0 else 0
+            step = plan.steps[i]
+            try:
+                resp = self._agree(lambda: self._with_retry(self._exec_3w, step.desc, step.wire, 2), i, 1)
+            except Exception:
+                self._save_resume("read", key, i)
+                raise
+            self._store_read9(i, resp)
+            i += 1
+            sent = self._stream(sent, i)
+            self._report_progress(i, self.size)
 
+        self.memory_loaded = True
+        self._decode_protection(self.protection_bits.to_pm())
         return bytes(self.main_memory)
 
+    def _store_read9(self, addr: int, resp):
+        self.main_memory[addr] = resp[0]
+        self.protection_bits[addr] = resp[1] == 0
+
                                                                
                 
                                                                
     def read_range(self, addr: int, length: int):
+        if self.bulk_read:
+            try:
+                self._select(0x05)
+                return bytes(BaseCard.read_range(self, addr, length))
+            except ApduError as exc:
+                if not self._unsupported(exc):
+                    raise
+                self._bulk_failed(exc)
+
         out = bytearray(length)
         for i in range(length):
-            resp = self._read9(addr + i)
+            resp = self._agree(lambda: self._with_retry(self._read9, addr + i), addr + i, 1)
             out[i] = resp[0]
         return bytes(out)
 
                                                                
            
                                                                
+    def is_writable(self, addr: int) -> bool:
+        # The error counter and PSC are only changed through verify/change_psc.
+        return 0 <= addr < FIXED.ERROR_COUNTER
+
+    def _changed_runs(self, addr: int, data: bytes, protect: bool):
+        """
+        Turns the diff against the card image into ("write" | "protect",
+        offset, length) runs. With protect set, bytes that already hold
+        the value only get their protection bit.
+        """
+        old = self.main_memory if self._image_known(addr, len(data)) else None
+        runs = []
+        unchanged = locked = 0
+
+        def add(kind, start, length):
+            if runs and runs[-1][0] == kind and runs[-1][1] + runs[-1][2] == start:
+                runs[-1][2] += length
+            else:
+                runs.append([kind, start, length])
+
+        for kind, start, length in diff_runs(old, data, addr, self.is_protected, self.is_writable):
+            if kind == LOCKED:
+                locked += length
+            elif kind == WRITE:
+                add("write", start - addr, length)
+            elif not protect:
+                unchanged += length
+            else:
+                for a in range(start, start + length):
+                    if not self.protection_bits[a]:
+                        add("protect", a - addr, 1)
+        return runs, unchanged, locked
+
+    def _write_run_bulk(self, addr: int, data: bytes) -> int:
+        """
+        Writes a run with WRITE BINARY in write_chunk pieces and returns
+        how many bytes the card confirmed. Only a reader that refuses the
+        instruction switches this card to 3-wire writes; other errors are
+        retried and then raised.
+        """
+        pos = 0
+        attempt = 0
+        while pos < len(data):
+            chunk = list(data[pos:pos + self.write_chunk])
+            apdu = self.profile.write(addr + pos, chunk)
+            try:
+                self.tx(apdu, ("log.write_chunk", addr + pos, len(chunk)))
+            except Exception as exc:
+                if self._length_rejected(exc) and self._step_down("write_chunk", WRITE_CHUNK_STEPS, exc):
+                    continue
+                if self._unsupported(exc):
+                    self.bulk_write = False
+                    self._log(f"{tr('log.bulk_write_fallback')}: {exc}")
+                    break
+                if not self._retry(exc, attempt):
+                    raise
+                attempt += 1
+                # A reconnect leaves the reader on its default card code.
+                self._select(0x05)
+                continue
+            attempt = 0
+            self._store_written3w(addr + pos, chunk, False)
+            pos += len(chunk)
+        return pos
+
+    @transactional
+    @verified
     def write_bytes(self, addr: int, data: bytes, protect=False):
         if not self.is_authenticated:
             raise Exception(tr("msg.psc_required"))
 
-        for i, b in enumerate(data):
-            a = addr + i
-            if a >= self.size:
-                break
-            if a == FIXED.ERROR_COUNTER:
-                break
+        data = bytes(data)
+        key = self._resume_key(addr, data, protect)
+        start = self._resume_point("write", key) or 0
+        if start:
+            self._log(f"{tr('log.resume_transfer')} {addr + start}")
+        self._forget_reads()
+
+        count = max(0, min(len(data), self.size - addr))
+        runs, unchanged, locked = self._changed_runs(addr + start, data[start:count], protect)
+        total = sum(n for _, _, n in runs)
+        cycles = 0
+
+        for kind, off, n in runs:
+            off += start
+            i = off
+            end = off + n
+            if kind == "write" and not protect and self.bulk_read and self.bulk_write:
+                self._select(0x05)
+                try:
+                    done = self._write_run_bulk(addr + i, data[i:end])
+                except Exception:
+                    # Confirmed chunks are already in the image, so the
+                    # resumed diff skips them.
+                    self.eeprom_cycles += cycles
+                    self._save_resume("write", key, i)
+                    raise
+                cycles += done
+                i += done
+
+            if kind == "protect":
+                plan = compile_3w_protect("SLE5528", addr + i, data[i:end])
+            else:
+                plan = compile_3w_write("SLE5528", addr + i, data[i:end], protect=protect)
+            base = i
+            while i < end:
+                _, done = self.run_plan(plan, i - base)
+                self._store_written3w(addr + i, data[i:i + done], protect)
+                cycles += done
+                i += done
+                if i >= end:
+                    break
 
-            apdu = build_3w_write(a, b, protect=protect)
-            self._exec_3w(f"{tr('log.write_byte')}[{a}]", apdu)
+                step = plan.steps[i - base]
+                try:
+                    self._with_retry(self._exec_3w, step.desc, step.wire)
+                except Exception:
+                    self.eeprom_cycles += cycles
+                    self._save_resume("write", key, i)
+                    raise
+                self._store_written3w(addr + i, data[i:i + 1], protect)
+                cycles += 1
+                i += 1
+                self._report_progress(cycles, total)
 
-            self.main_memory[a] = b
+        self.last_write_cycles = cycles
+        self.eeprom_cycles += cycles
+        self._log(
+            f"{tr('log.eeprom_cycles')}: {cycles} · {tr('log.bytes_unchanged')}: {unchanged}"
+            f" · {tr('log.bytes_locked')}: {locked}"
+        )
+
+    def _store_written3w(self, addr: int, data, protect: bool):
+        self._mark_written(addr, data)
+        for n, b in enumerate(data):
+            self.main_memory[addr + n] = b
             if protect:
-                self.prot[a] = 1
+                self.protection_bits[addr + n] = True
+        if protect:
+            self._sync_protection()
 
                                                                
                   
                                                                
-    def protect_byte(self, addr: int):
-        if addr >= self.size:
-            raise ValueError(tr("error.invalid_address"))
+    def read_protection_map(self):
+        return list(self.protection_bits)
 
-        val = self.main_memory[addr]
-        apdu = build_3w_command(0x30, addr, val)
-        self._exec_3w(f"{tr('log.protect_byte')}[{addr}]", apdu)
+    def _fetch_protection(self):
+        if self.bulk_read:
+            try:
+                self._select(0x05)
+                return self._read_protection_bulk()
+            except ApduError as exc:
+                if not self._unsupported(exc):
+                    raise
+                self._bulk_failed(exc)
+        self.read_all()
+        return self.protection_memory
 
-        self.prot[addr] = 1
+    def _load_protection(self, indices):
+        if self.protection_loaded or self.bulk_read:
+            return super()._load_protection(indices)
+        # Each 9-bit read carries the protection bit, so only the requested
+        # bytes are read instead of the whole card.
+        for a in sorted({i for i in indices if 0 <= i < self.size}):
+            self._store_read9(a, self._with_retry(self._read9, a))
 
-    def read_protection_map(self):
-        return list(self.prot)
+    def _protect_run(self, start: int, data):
+        if self.bulk_read and self.bulk_write:
+            try:
+                self._select(0x05)
+                return super()._protect_run(start, data)
+            except ApduError as exc:
+                if not self._unsupported(exc):
+                    raise
+                self.bulk_write = False
+                self._log(f"{tr('log.bulk_write_fallback')}: {exc}")
+
+        # Compare-and-protect is idempotent, so a run cut short by the bulk
+        # path is simply sent again in full.
+        for step in compile_3w_protect("SLE5528", start, data).steps:
+            self._with_retry(self._exec_3w, step.desc, step.wire)
+
+    def _refresh_protection(self, runs):
+        if self.bulk_read:
+            return super()._refresh_protection(runs)
+        for start, length in runs:
+            for a in range(start, start + length):
+                self._store_read9(a, self._with_retry(self._read9, a))
+        self._sync_protection()
+
+    def _sync_protection(self):
+        # Only a map that was fully loaded may stand in for the card's.
+        if self.protection_loaded:
+            self._decode_protection(self.protection_bits.to_pm())
 
                                                                
                                 
@@ -124,11 +382,16 @@ class SLE5528(BaseCard):
         if len(psc) != 2:
             raise ValueError(tr("error.psc_must_be_2bytes"))
 
-        apdu = build_3w_verify(psc)
-        self._exec_3w(tr("log.verify_psc"), apdu)
+        try:
+            for index in range(len(psc)):
+                self._exec_3w(("log.verify_psc",), build_3w_verify(psc, index))
+        finally:
+            # Verify always moves the error counter.
+            self.cache.drop("security")
 
         self.psc = list(psc)
         self.is_authenticated = True
+        self.auth_psc = list(psc)
         self._log(tr("log.auth_ok"))
         return True
 
@@ -142,9 +405,10 @@ class SLE5528(BaseCard):
         apdu1 = build_3w_write(FIXED.PSC1, new_psc[0], protect=False)
         apdu2 = build_3w_write(FIXED.PSC2, new_psc[1], protect=False)
 
-        self._exec_3w(tr("log.write_psc1"), apdu1)
-        self._exec_3w(tr("log.write_psc2"), apdu2)
+        self._exec_3w(("log.write_psc1",), apdu1)
+        self._exec_3w(("log.write_psc2",), apdu2)
 
         self.psc = list(new_psc)
+        self.auth_psc = list(new_psc)
         self._log(tr("log.change_psc_ok"))
         return True
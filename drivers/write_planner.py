@@ -0,0 +1,91 @@
+from core.language_manager import tr
+from core.apdu_log import hex_bytes
+
+
+WRITE = "write"
+SAME = "same"
+LOCKED = "locked"
+
+
+def diff_runs(old, new, addr: int = 0, protected=None, writable=None):
+    """
+    Yields (kind, addr, length) runs comparing new, meant for addr on,
+    against old. kind is WRITE for bytes that need programming, SAME for
+    bytes already holding the value and LOCKED for bytes the card would
+    refuse: protected or outside the writable area. With old None the
+    card content is unknown and every writable byte is a WRITE.
+    """
+    run_kind = None
+    run_start = 0
+    for i, b in enumerate(new):
+        a = addr + i
+        if old is not None and a < len(old) and old[a] == b:
+            kind = SAME
+        elif writable is not None and not writable(a):
+            kind = LOCKED
+        elif protected is not None and protected(a):
+            kind = LOCKED
+        else:
+            kind = WRITE
+
+        if kind != run_kind:
+            if run_kind is not None:
+                yield run_kind, addr + run_start, i - run_start
+            run_kind = kind
+            run_start = i
+    if run_kind is not None:
+        yield run_kind, addr + run_start, len(new) - run_start
+
+
+class WritePlan:
+    """
+    The write ranges needed to turn the card into a target image, plus
+    what was left out. Built by plan_writes; drivers only send ranges.
+    """
+
+    def __init__(self, ranges, unchanged: int, locked, blind: bool):
+        self.ranges = ranges
+        self.unchanged = unchanged
+        self.locked = locked
+        self.blind = blind
+
+    @property
+    def total(self) -> int:
+        return sum(len(data) for _, data in self.ranges)
+
+    def __bool__(self):
+        return bool(self.ranges)
+
+    def summary(self) -> str:
+        text = (
+            f"{tr('log.write_plan')}: {len(self.ranges)} {tr('label.ranges')}, {self.total} bytes"
+            f" · {tr('log.bytes_unchanged')}: {self.unchanged}"
+            f" · {tr('log.bytes_locked')}: {len(self.locked)}"
+        )
+        if self.blind:
+            text += f" · {tr('log.write_plan_blind')}"
+        return text
+
+    def preview(self) -> str:
+        lines = [self.summary()]
+        for addr, data in self.ranges:
+            lines.append(f"  {addr:04X} [{len(data):3d}]  {hex_bytes(data[:16])}{' …' if len(data) > 16 else ''}")
+        if self.locked:
+            lines.append(f"  {tr('log.bytes_locked')}: {', '.join(f'{a:04X}' for a in self.locked[:32])}"
+                         f"{' …' if len(self.locked) > 32 else ''}")
+        return "\n".join(lines)
+
+
+def plan_writes(old, new, addr: int = 0, protected=None, writable=None) -> WritePlan:
+    new = bytes(new)
+    ranges = []
+    unchanged = 0
+    locked = []
+    for kind, start, length in diff_runs(old, new, addr, protected, writable):
+        if kind == WRITE:
+            ranges.append((start, new[start - addr:start - addr + length]))
+        elif kind == SAME:
+            unchanged += length
+        else:
+            locked.extend(range(start, start + length))
+    return WritePlan(ranges, unchanged, locked, old is None)
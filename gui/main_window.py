@@ -1,3 +1,6 @@
+import os
+import time
+
 from PySide6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
     QComboBox, QPushButton, QLabel, QTabWidget, QStatusBar,
@@ -19,6 +22,11 @@ from controllers.app_controller import AppController
 from core.settings_manager import SettingsManager
 from core.language_manager import LanguageManager, init_language
 from core.card_worker import CardWorker
+from core.reader_monitor import ReaderMonitor
+from core.worker_pool import ReaderPool
+from core.apdu_log import ApduLogSink, LogBuffer, LEVELS, DEBUG, INFO
+from core.apdu_stats import ApduStats
+from drivers.base_card import CONSENSUS_READS
 from PySide6.QtCore import QTimer
 from PySide6.QtGui import QIcon
 from core.resource import resource_path
@@ -26,6 +34,10 @@ from core.resource import resource_path
 
 class MainWindow(QMainWindow):
     requestReadCard = Signal()
+    requestPages = Signal(int, int)
+    requestCompleteDump = Signal()
+    requestJob = Signal(str, list)
+    logBatchReady = Signal()
 
     def __init__(self):
         super().__init__()
@@ -45,6 +57,18 @@ class MainWindow(QMainWindow):
         )
         self.controller.main = self
 
+        self.log_buffer = LogBuffer(notify=self.logBatchReady.emit)
+        self.log_sink = ApduLogSink(
+            self.log_buffer.push,
+            level=LEVELS.get(self.settings.get("log_level", "debug"), DEBUG),
+        )
+        self.logBatchReady.connect(self.flush_log, Qt.QueuedConnection)
+        self.controller.log = self.log_sink.text
+        self.controller.log_sink = self.log_sink
+        self.apdu_stats = ApduStats()
+        self.controller.apdu_stats = self.apdu_stats
+        self._stats_version = -1
+
         self.setWindowTitle("SLE Suite PRO")
         self.resize(1100, 750)
 
@@ -56,6 +80,9 @@ class MainWindow(QMainWindow):
         self._build_menu_bar()
         self._build_status_bar()
 
+        self.pool = None
+        self.pool_folder = None
+
         self.thread = QThread(self)
         self.worker = CardWorker(self.controller)
         self.worker.moveToThread(self.thread)
@@ -64,10 +91,26 @@ class MainWindow(QMainWindow):
         self.worker.log.connect(self.log)
         self.worker.error.connect(self.on_worker_error)
         self.worker.finished.connect(self.on_worker_finished)
+        self.worker.job_finished.connect(self.on_job_finished)
+        self.worker.chunk.connect(self.on_read_chunk)
 
         self.requestReadCard.connect(self.worker.read_card)
-
-        self.controller.log = lambda msg: self.worker.log.emit(msg)
+        self.requestPages.connect(self.worker.read_pages)
+        self.requestCompleteDump.connect(self.worker.complete_dump)
+        self.requestJob.connect(self.worker.run_job)
+        self.tab_card.hex.viewport_changed.connect(self.on_viewport_changed)
+
+
+        self.monitor_thread = QThread(self)
+        self.monitor = ReaderMonitor()
+        self.monitor.moveToThread(self.monitor_thread)
+        self.monitor_thread.started.connect(self.monitor.run)
+        self.monitor.reader_added.connect(self.on_reader_added)
+        self.monitor.reader_removed.connect(self.on_reader_removed)
+        self.monitor.card_inserted.connect(self.on_card_inserted)
+        self.monitor.card_removed.connect(self.on_card_removed)
+        self.monitor.error.connect(lambda msg: self.log(f"{self.tr('msg.monitor_error')}: {msg}"))
+        self.monitor_thread.start()
         icon_path = resource_path("assets/logo.ico")
         self.setWindowIcon(QIcon(icon_path))
         self.refresh_readers()
@@ -75,6 +118,14 @@ class MainWindow(QMainWindow):
         # QTimer.singleShot(200, lambda: AboutDialog(self, self.tr).exec())
 
     def closeEvent(self, event):
+        if self.pool is not None:
+            self.pool.shutdown()
+        try:
+            self.monitor.stop()
+            self.monitor_thread.quit()
+            self.monitor_thread.wait()
+        except Exception:
+            pass
         try:
             self.thread.quit()
             self.thread.wait()
@@ -86,13 +137,47 @@ class MainWindow(QMainWindow):
         self.log(f"ERROR: {msg}")
         self.lbl_status.setText(self.tr("msg.error"))
         self.btn_read.setEnabled(True)
+        self.tab_card.btn_complete_dump.setEnabled(True)
+
+    def on_read_chunk(self, addr: int, data: list):
+        # The header arrives first: show it while the rest is still read.
+        if addr == 0:
+            card = self.controller.card
+            self.tab_card.hex.begin_stream(card.size if card else len(data))
+            idx = self.tabs.indexOf(self.tab_card)
+            if idx != -1:
+                self.tabs.setCurrentIndex(idx)
+            try:
+                self.tab_chipinfo.load_header(data)
+            except Exception as exc:
+                self.log(f"{self.tr('msg.chipinfo_tab_error')}: {exc}")
+        self.tab_card.hex.update_range(addr, data)
+
+    def on_viewport_changed(self, first: int, last: int):
+        card = self.controller.card
+        if card is not None and card.loaded_pages and not card.memory_loaded:
+            self.requestPages.emit(first, last)
+
+    def complete_dump(self):
+        card = self.controller.card
+        if card is None or card.memory_loaded:
+            return
+        self.log(self.tr("msg.reading_card"))
+        self.btn_read.setEnabled(False)
+        self.tab_card.btn_complete_dump.setEnabled(False)
+        self.requestCompleteDump.emit()
 
     def on_worker_finished(self, result):
         self.btn_read.setEnabled(True)
+        self.tab_card.btn_complete_dump.setEnabled(True)
 
         if isinstance(result, list):
             try:
                 self.tab_card.load_data(result)
+                card = self.controller.card
+                if card is not None and not card.memory_loaded:
+                    self.tab_card.show_lazy_image(card)
+                    self.tab_card.hex.refresh_viewport()
                 self.tab_card.update_state(connected=True, card_loaded=True)
                 idx = self.tabs.indexOf(self.tab_card)
                 if idx != -1:
@@ -128,6 +213,7 @@ class MainWindow(QMainWindow):
         file_menu.addAction(self.tr("menu.export_bin")).triggered.connect(self.action_export_bin)
         file_menu.addSeparator()
         file_menu.addAction(self.tr("menu.compare_dumps")).triggered.connect(self.tab_card.open_compare_dialog)
+        file_menu.addAction(self.tr("menu.read_all_readers")).triggered.connect(self.action_read_all_readers)
         file_menu.addSeparator()
         file_menu.addAction(self.tr("menu.exit")).triggered.connect(self.close)
 
@@ -137,6 +223,32 @@ class MainWindow(QMainWindow):
         theme_menu.addAction(self.tr("theme.light")).triggered.connect(lambda: self.update_theme("light"))
         theme_menu.addAction(self.tr("theme.dark")).triggered.connect(lambda: self.update_theme("dark"))
 
+        act_auto_read = settings_menu.addAction(self.tr("menu.auto_read"))
+        act_auto_read.setCheckable(True)
+        act_auto_read.setChecked(bool(self.settings.get("auto_read_on_insert", False)))
+        act_auto_read.toggled.connect(lambda on: self.settings.set("auto_read_on_insert", on))
+
+        act_verify = settings_menu.addAction(self.tr("menu.verify_writes"))
+        act_verify.setCheckable(True)
+        act_verify.setChecked(bool(self.settings.get("verify_writes", False)))
+        act_verify.toggled.connect(self.set_verify_writes)
+
+        act_consensus = settings_menu.addAction(self.tr("menu.consensus_read"))
+        act_consensus.setCheckable(True)
+        act_consensus.setChecked(int(self.settings.get("consensus_reads", 1)) > 1)
+        act_consensus.toggled.connect(self.set_consensus_read)
+
+        act_lazy = settings_menu.addAction(self.tr("menu.lazy_read"))
+        act_lazy.setCheckable(True)
+        act_lazy.setChecked(bool(self.settings.get("lazy_read", False)))
+        act_lazy.toggled.connect(lambda on: self.settings.set("lazy_read", on))
+
+        act_trace = settings_menu.addAction(self.tr("menu.apdu_trace"))
+        act_trace.setCheckable(True)
+        act_trace.setChecked(self.log_sink.level <= DEBUG)
+        act_trace.toggled.connect(self.set_apdu_trace)
+        settings_menu.addAction(self.tr("menu.reset_apdu_stats")).triggered.connect(self.reset_apdu_stats)
+
         #lang_menu = settings_menu.addMenu(self.tr("menu.language"))
         #for lang_code in self.settings.available_langs:
         #    lang_menu.addAction(lang_code).triggered.connect(
@@ -224,6 +336,12 @@ class MainWindow(QMainWindow):
         self.lbl_status.setStyleSheet("color: red; font-weight: bold;")
         status.addWidget(self.lbl_status)
 
+        self.lbl_stats = QLabel("")
+        status.addPermanentWidget(self.lbl_stats)
+        self.stats_timer = QTimer(self)
+        self.stats_timer.timeout.connect(self.update_stats_label)
+        self.stats_timer.start(1000)
+
         self.btn_clear_log = QPushButton(self.tr("btn.clear_log"))
         self.btn_clear_log.clicked.connect(self.log_panel.clear_log)
         status.addPermanentWidget(self.btn_clear_log)
@@ -240,6 +358,37 @@ class MainWindow(QMainWindow):
     def log(self, msg: str):
         self.log_panel.log(msg)
 
+    def flush_log(self):
+        for item in self.log_buffer.drain():
+            self.log_panel.log(item if isinstance(item, str) else item.render())
+
+    def update_stats_label(self):
+        if self.apdu_stats.version == self._stats_version:
+            return
+        self._stats_version = self.apdu_stats.version
+        self.lbl_stats.setText(self.apdu_stats.summary_text())
+        self.lbl_stats.setToolTip(self.apdu_stats.table_text())
+
+    def reset_apdu_stats(self):
+        self.apdu_stats.reset()
+        self.update_stats_label()
+
+    def set_verify_writes(self, enabled: bool):
+        self.settings.set("verify_writes", enabled)
+        if self.controller.card is not None:
+            self.controller.card.verify_writes = enabled
+
+    def set_consensus_read(self, enabled: bool):
+        reads = CONSENSUS_READS if enabled else 1
+        self.settings.set("consensus_reads", reads)
+        if self.controller.card is not None:
+            self.controller.card.consensus_reads = reads
+
+    def set_apdu_trace(self, enabled: bool):
+        level = DEBUG if enabled else INFO
+        self.log_sink.level = level
+        self.settings.set("log_level", "debug" if enabled else "info")
+
     def refresh_readers(self):
         self.reader_combo.clear()
         readers = self.controller.list_readers()
@@ -257,6 +406,49 @@ class MainWindow(QMainWindow):
             self.lbl_status.setStyleSheet("color: red; font-weight: bold;")
             self.log(self.tr("msg.no_readers"))
 
+    def _is_connected_to(self, reader_name: str) -> bool:
+        reader = self.controller.connected_reader
+        return reader is not None and str(reader) == reader_name
+
+    def on_reader_added(self, name: str):
+        self.log(f"{self.tr('msg.reader_added')}: {name}")
+        if self.controller.connected_reader is None:
+            self.refresh_readers()
+
+    def on_reader_removed(self, name: str):
+        self.log(f"{self.tr('msg.reader_removed')}: {name}")
+        if self._is_connected_to(name):
+            self.disconnect_reader()
+        if self.controller.connected_reader is None:
+            self.refresh_readers()
+
+    def on_card_inserted(self, name: str, atr: list):
+        atr_str = " ".join(f"{x:02X}" for x in atr)
+        self.log(f"{self.tr('msg.card_inserted')}: {name} | ATR: {atr_str}")
+
+        if not self._is_connected_to(name):
+            return
+
+        # Card I/O stays on the worker thread, queued behind any running job.
+        self.requestJob.emit("connect", [self.controller.session.reader])
+
+    def on_card_removed(self, name: str):
+        self.log(f"{self.tr('msg.card_removed')}: {name}")
+
+        if not self._is_connected_to(name):
+            return
+
+        self.requestJob.emit("invalidate", [])
+
+    def on_job_finished(self, job: str, result):
+        if job == "connect":
+            self.tab_card.update_state(connected=True, card_loaded=False)
+            if self.settings.get("auto_read_on_insert", False) and self.btn_read.isEnabled():
+                self.read_card()
+        elif job == "invalidate":
+            self.tab_card.update_state(connected=True, card_loaded=False)
+            self.update_psc_state()
+
     def connect_reader(self):
         idx = self.reader_combo.currentIndex()
         if idx < 0:
@@ -342,6 +534,54 @@ class MainWindow(QMainWindow):
         except Exception as exc:
             self.log(f"{self.tr('msg.error')} {exc}")
 
+    def action_read_all_readers(self):
+        readers = self.controller.list_readers()
+        if not readers:
+            self.log(self.tr("msg.no_readers"))
+            return
+
+        folder = QFileDialog.getExistingDirectory(self, self.tr("menu.read_all_readers"))
+        if not folder:
+            return
+
+        if self.controller.connected_reader is not None:
+            self.disconnect_reader()
+
+        if self.pool is None:
+            self.pool = ReaderPool(
+                self.pcsc, self.settings, log_sink=self.log_sink, reader_caps=self.controller.reader_caps
+            )
+            self.pool.apdu_stats = self.apdu_stats
+            self.pool.log.connect(self.log)
+            self.pool.job_progress.connect(self.on_pool_progress)
+            self.pool.job_finished.connect(self.on_pool_finished)
+            self.pool.job_error.connect(self.on_pool_error)
+            self.pool.idle.connect(lambda: self.statusBar().showMessage(self.tr("msg.pool_done"), 5000))
+
+        self.pool_folder = folder
+        for r in readers:
+            self.pool.add_reader(r)
+        self.pool.broadcast("read")
+
+    def on_pool_progress(self, reader: str, done: int, total: int):
+        self.statusBar().showMessage(f"{reader}: {done}/{total}")
+
+    def on_pool_finished(self, reader: str, job: str, result):
+        if job != "read" or not self.pool_folder:
+            return
+
+        name = "".join(c if c.isalnum() else "_" for c in reader)[:40]
+        path = os.path.join(self.pool_folder, f"{time.strftime('%Y%m%d-%H%M%S')}_{name}.bin")
+        try:
+            with open(path, "wb") as fh:
+                fh.write(bytes(result))
+            self.log(f"[{reader}] {self.tr('msg.export_ok')}: {path}")
+        except Exception as exc:
+            self.log(f"[{reader}] {self.tr('msg.error')} {exc}")
+
+    def on_pool_error(self, reader: str, job: str, msg: str):
+        self.log(f"[{reader}] ERROR ({job}): {msg}")
+
     def update_theme(self, theme: str):
         self.current_theme = theme
         self.setStyleSheet(THEMES.get(theme, THEMES["dark"]))
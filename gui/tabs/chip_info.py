@@ -7,6 +7,10 @@ from PySide6.QtWidgets import (
 from PySide6.QtCore import Qt
 from core.language_manager import tr
 
+# Header bytes used by _decode_common_layout: ATR header, manufacturer
+# data and DIR data. Adjacent, so the driver fetches them with one read.
+HEADER_RANGES = ((0, 4), (4, 13), (17, 13))
+
 
 class TabChipInfo(QWidget):
     def __init__(self, main):
@@ -250,9 +254,28 @@ class TabChipInfo(QWidget):
             self.grp_sm.grid.addWidget(psc_lbl, 2, 1)
 
     def load_chip(self, card):
+        mem = getattr(card, "main_memory", None)
+        if not mem:
+            try:
+                parts = card.read_ranges(HEADER_RANGES)
+                mem = [b for part in parts for b in part]
+            except Exception as e:
+                self.main.log(f"{tr('log.memory_read_fail')}: {e}")
+                mem = []
+
+        ctype = self.load_header(mem)
+        if ctype in ("SLE4428", "SLE5528"):
+            self._build_sm_4428(card)
+        else:
+            self._build_sm_4442(card)
+
+    def load_header(self, mem) -> str:
+        """Fills every group but the security memory from the header bytes."""
         self.clear()
 
-        atr = self.main.controller.conn.getATR()
+        # The session's copy: the connection belongs to the worker thread.
+        session = self.main.controller.session
+        atr = session.atr if session else []
         atr_hex = " ".join(f"{b:02X}" for b in atr)
         self._add_line(self.grp_atr, 0, tr("label.atr"), atr_hex)
 
@@ -261,14 +284,6 @@ class TabChipInfo(QWidget):
             ctype = self.main.controller.detect_card_type()
         self._add_line(self.grp_chip, 0, tr("label.detected_type"), ctype)
 
-        mem = getattr(card, "main_memory", None)
-        if not mem:
-            try:
-                mem = card.read_all()
-            except Exception as e:
-                self.main.log(f"{tr('log.memory_read_fail')}: {e}")
-                mem = []
-
         mem_bytes = list(mem) if mem else []
         header_items, manuf_items, dir_items = self._decode_common_layout(mem_bytes)
 
@@ -290,14 +305,4 @@ class TabChipInfo(QWidget):
             self._add_line(self.grp_dir, r, it.name + ":", it.value)
             r += 1
 
-        for group in (self.grp_sm,):
-            while group.grid.count():
-                item = group.grid.takeAt(0)
-                w = item.widget()
-                if w:
-                    w.deleteLater()
-
-        if ctype in ("SLE4428", "SLE5528"):
-            self._build_sm_4428(card)
-        else:
-            self._build_sm_4442(card)
\ No newline at end of file
+        return ctype
\ No newline at end of file
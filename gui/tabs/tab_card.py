@@ -50,6 +50,14 @@ class TabCard(QWidget):
         self.btn_write.clicked.connect(self.write_changes)
         top.addWidget(self.btn_write)
 
+        self.btn_preview_write = QPushButton(self.tr("btn.preview_write"))
+        self.btn_preview_write.clicked.connect(self.preview_write)
+        top.addWidget(self.btn_preview_write)
+
+        self.btn_complete_dump = QPushButton(self.tr("btn.complete_dump"))
+        self.btn_complete_dump.clicked.connect(self.main.complete_dump)
+        top.addWidget(self.btn_complete_dump)
+
         self.btn_pinobtain = QPushButton(self.tr("btn.obtain_psc"))
         self.btn_pinobtain.clicked.connect(self.obtain_psc)
         top.addWidget(self.btn_pinobtain)
@@ -72,7 +80,16 @@ class TabCard(QWidget):
         self.btn_auth.setVisible(visible)
         self.btn_change_psc.setVisible(visible)
         self.btn_write.setVisible(visible)
+        self.btn_preview_write.setVisible(visible)
         self.btn_pinobtain.setVisible(visible)
+        card = self.main.controller.card if visible else None
+        self.btn_complete_dump.setVisible(card is not None and not card.memory_loaded and bool(card.loaded_pages))
+
+    def show_lazy_image(self, card):
+        """Blanks the pages of a lazy image that have not been read yet."""
+        for addr in range(0, card.size, card.page_size):
+            if not card.page_loaded(addr):
+                self.hex.blank_range(addr, card.page_size)
 
     def load_data(self, data: bytes):
         self.adjust_psc_field()
@@ -156,12 +173,27 @@ class TabCard(QWidget):
                 return
 
             data = self.hex.get_bytes()
-            card.write_bytes(0, data)
+            plan = card.write_changes(data)
+            if not plan:
+                self.main.log(self.tr("msg.nothing_to_write"))
+                return
             self.main.log(self.tr("msg.write_ok"))
 
         except Exception as e:
             self.main.log(f"{self.tr('msg.error_write')} {e}")
 
+    def preview_write(self):
+        card = self.main.controller.card
+        if not card:
+            self.main.log(self.tr("msg.no_card_loaded"))
+            return
+
+        try:
+            plan = card.write_changes(self.hex.get_bytes(), dry_run=True)
+            QMessageBox.information(self, self.tr("btn.preview_write"), plan.preview())
+        except Exception as e:
+            self.main.log(f"{self.tr('msg.error_write')} {e}")
+
     def adjust_psc_field(self):
         card = self.main.controller.card
         if not card:
@@ -82,22 +82,7 @@ class TabProtection(QWidget):
             return
 
         bits = getattr(card, "protection_bits", None)
-
-        if isinstance(bits, dict):
-            if bits:
-                max_index = max(bits.keys()) + 1
-                tmp = [False] * max_index
-                for i, v in bits.items():
-                    if 0 <= i < max_index:
-                        tmp[i] = bool(v)
-                bits = tmp
-            else:
-                bits = []
-
-        if bits is None:
-            bits = []
-
-        bits = list(bits)
+        bits = bits.to_list() if bits is not None else []
         self.original_bits = list(bits)
         total = len(bits)
 
@@ -1,9 +1,12 @@
 from PySide6.QtWidgets import QWidget, QGridLayout, QLineEdit, QLabel, QScrollArea, QVBoxLayout, QFrame
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QTimer, Signal
 import re
 
 
 class HexEditor(QWidget):
+    # First and last byte address on screen, after scrolling settles.
+    viewport_changed = Signal(int, int)
+
     def __init__(self):
         super().__init__()
 
@@ -29,6 +32,12 @@ class HexEditor(QWidget):
 
         self.scroll.setWidget(self.inner)
 
+        self._viewport_timer = QTimer(self)
+        self._viewport_timer.setSingleShot(True)
+        self._viewport_timer.setInterval(80)
+        self._viewport_timer.timeout.connect(self._emit_viewport)
+        self.scroll.verticalScrollBar().valueChanged.connect(lambda _: self._viewport_timer.start())
+
         wrapper = QVBoxLayout()
         wrapper.addWidget(self.scroll)
         wrapper.setContentsMargins(0, 0, 0, 0)
@@ -152,6 +161,63 @@ class HexEditor(QWidget):
         # Force black color on all headers
         self.force_headers_black()
 
+    def begin_stream(self, size: int):
+        """Lays out an empty grid of size bytes for update_range to fill."""
+        self.load_data(bytes(size))
+        self.blank_range(0, size)
+
+    def blank_range(self, addr: int, length: int):
+        """Shows bytes not read from the card yet as empty, read-only cells."""
+        end = min(addr + length, len(self.data))
+        for idx in range(addr, end):
+            cell = self.cells[idx // 16][idx % 16]
+            cell.setText("")
+            cell.setEnabled(False)
+        for row in range(addr // 16, (end + 15) // 16):
+            if row < len(self.ascii_rows):
+                self.ascii_rows[row].setText("")
+
+    def visible_range(self) -> tuple[int, int]:
+        top = self.scroll.verticalScrollBar().value()
+        bottom = top + self.scroll.viewport().height()
+        rows = [i for i, lbl in enumerate(self.offset_labels)
+                if lbl.y() + lbl.height() >= top and lbl.y() <= bottom]
+        if not rows:
+            return 0, -1
+        return rows[0] * 16, min(rows[-1] * 16 + 15, len(self.data) - 1)
+
+    def refresh_viewport(self):
+        self._viewport_timer.start()
+
+    def _emit_viewport(self):
+        first, last = self.visible_range()
+        if last >= first:
+            self.viewport_changed.emit(first, last)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.refresh_viewport()
+
+    def update_range(self, addr: int, data):
+        """Shows bytes as a streamed read delivers them."""
+        for i, b in enumerate(data):
+            idx = addr + i
+            if idx >= len(self.data):
+                break
+            self.data[idx] = b
+            cell = self.cells[idx // 16][idx % 16]
+            cell.blockSignals(True)
+            cell.setText(f"{b:02X}")
+            cell.blockSignals(False)
+            cell.setEnabled(True)
+
+        last = min(addr + len(data), len(self.data))
+        for row in range(addr // 16, (last + 15) // 16):
+            if row >= len(self.ascii_rows):
+                break
+            line = self.data[row * 16:row * 16 + 16]
+            self.ascii_rows[row].setText("".join(chr(b) if 32 <= b < 127 else "." for b in line))
+
     def write_cell(self, index: int, new_text: str):
         row = index // 16
         col = index % 16
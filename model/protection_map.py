@@ -0,0 +1,116 @@
+class ProtectionMap:
+    """
+    Protection state of a card as a bitset: bit i set means byte i is
+    write-protected. Held in one Python int, so decoding the card's
+    protection memory (a set bit there means the byte is still free) is a
+    single from_bytes and an inversion instead of a loop over every bit.
+    """
+
+    __slots__ = ("size", "mask")
+
+    def __init__(self, size: int, mask: int = 0):
+        self.size = size
+        self.mask = mask & self._full()
+
+    def _full(self) -> int:
+        return (1 << self.size) - 1
+
+    @classmethod
+    def from_pm(cls, pm, size: int = None) -> "ProtectionMap":
+        pm = bytes(pm)
+        if size is None:
+            size = len(pm) * 8
+        free = int.from_bytes(pm, "little")
+        return cls(size, ~free)
+
+    @classmethod
+    def from_flags(cls, flags) -> "ProtectionMap":
+        flags = list(flags)
+        mask = 0
+        for i, flag in enumerate(flags):
+            if flag:
+                mask |= 1 << i
+        return cls(len(flags), mask)
+
+    def to_pm(self) -> bytes:
+        free = ~self.mask & self._full()
+        return free.to_bytes((self.size + 7) // 8, "little")
+
+    def load_pm(self, addr: int, pm):
+        """Merges protection-memory bytes that start at card address addr."""
+        pm = bytes(pm)
+        width = min(len(pm) * 8, self.size - addr)
+        if width <= 0:
+            return
+        window = ((1 << width) - 1) << addr
+        protected = (~int.from_bytes(pm, "little") & ((1 << width) - 1)) << addr
+        self.mask = (self.mask & ~window) | protected
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, i: int) -> bool:
+        if not 0 <= i < self.size:
+            raise IndexError(i)
+        return bool((self.mask >> i) & 1)
+
+    def __setitem__(self, i: int, value):
+        if not 0 <= i < self.size:
+            raise IndexError(i)
+        if value:
+            self.mask |= 1 << i
+        else:
+            self.mask &= ~(1 << i)
+
+    def __iter__(self):
+        mask = self.mask
+        for i in range(self.size):
+            yield bool((mask >> i) & 1)
+
+    def __eq__(self, other):
+        return isinstance(other, ProtectionMap) and (self.size, self.mask) == (other.size, other.mask)
+
+    def set_range(self, start: int, length: int):
+        self.mask |= ((1 << length) - 1) << start
+        self.mask &= self._full()
+
+    def count(self, start: int = 0, length: int = None) -> int:
+        if length is None:
+            length = self.size - start
+        return bin((self.mask >> start) & ((1 << length) - 1)).count("1")
+
+    def all_in(self, start: int, length: int) -> bool:
+        return self.count(start, length) == length
+
+    def any_in(self, start: int, length: int) -> bool:
+        return self.count(start, length) > 0
+
+    def protected(self) -> list[int]:
+        mask = self.mask
+        out = []
+        while mask:
+            low = mask & -mask
+            out.append(low.bit_length() - 1)
+            mask ^= low
+        return out
+
+    def missing(self, indices) -> list[int]:
+        """The indices, sorted and in range, that are not protected yet."""
+        return sorted({i for i in indices if 0 <= i < self.size and not (self.mask >> i) & 1})
+
+    def to_list(self) -> list[bool]:
+        return list(self)
+
+    def __repr__(self):
+        return f"ProtectionMap({self.size}, {self.count()} protected)"
+
+
+def index_runs(indices) -> list[tuple[int, int]]:
+    """Sorted indices as (start, length) runs of consecutive values."""
+    runs = []
+    for i in sorted(set(indices)):
+        if runs and runs[-1][0] + runs[-1][1] == i:
+            runs[-1][1] += 1
+        else:
+            runs.append([i, 1])
+    return [(start, length) for start, length in runs]
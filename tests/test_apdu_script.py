@@ -0,0 +1,21 @@
+from argparse import Namespace
+
+from core.apdu_log import DEBUG
+from core.apdu_script import _open_card
+from core.apdu_stats import ApduStats
+
+
+def _args(log):
+    return Namespace(virtual="SLE4442", reader=None, type="SLE4442", log=log)
+
+
+def test_script_card_traces_nothing_without_log():
+    controller, card, _, _ = _open_card(_args(False), ApduStats())
+    assert card.sink is not None and not card.sink.enabled(DEBUG)
+    controller.disconnect_reader()
+
+
+def test_script_card_traces_with_log():
+    controller, card, _, _ = _open_card(_args(True), ApduStats())
+    assert card.sink.enabled(DEBUG)
+    controller.disconnect_reader()
@@ -0,0 +1,34 @@
+import pytest
+
+from controllers.app_controller import AppController
+from core.virtual_card import VirtualCard, VirtualReader
+
+
+class Settings(dict):
+    path = "/nonexistent/settings.json"
+
+
+def _controller(kind="SLE4428", lazy=True):
+    memory = [i & 0xFF for i in range(1024)]
+    memory[0:4] = [0x92, 0x23, 0x10, 0x91]
+    ctrl = AppController(None, Settings(lazy_read=lazy), lambda msg: None)
+    ctrl.reader_caps = None
+    ctrl.connect_reader(VirtualReader(VirtualCard(kind, memory=memory)))
+    ctrl.load_card(kind)
+    return ctrl, memory
+
+
+def test_export_refuses_a_partial_lazy_image():
+    ctrl, _ = _controller()
+    with pytest.raises(Exception):
+        ctrl.export_memory()
+
+
+def test_export_includes_pages_read_after_the_lazy_load():
+    ctrl, _ = _controller()
+    ctrl.card.ensure_pages(512, 600)
+    ctrl.card.complete_image()
+    full, _ = _controller(lazy=False)
+
+    assert ctrl.export_memory() == bytes(full.memory)
+    assert ctrl.export_memory()[512:528] != b"\xff" * 16
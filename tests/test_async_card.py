@@ -0,0 +1,55 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from controllers.app_controller import AppController
+from core.async_card import AsyncCard
+from core.virtual_card import VirtualCard, VirtualReader
+
+
+def _card():
+    vc = VirtualCard("SLE4428", latency=0.002)
+    controller = AppController(None, None, lambda msg: None)
+    controller.connect_reader(VirtualReader(vc))
+    controller.create_card("SLE4428")
+    controller.card.read_chunk = 16
+    return vc, AsyncCard(controller, ThreadPoolExecutor(max_workers=1))
+
+
+def test_cancelling_a_queued_call_leaves_the_running_one_alone():
+    vc, card = _card()
+
+    async def scenario():
+        running = asyncio.ensure_future(card.read_all())
+        await asyncio.sleep(0.02)
+        queued = asyncio.ensure_future(card.read_range(0, 512))
+        await asyncio.sleep(0)
+        queued.cancel()
+        data = await running
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        return data
+
+    data = asyncio.run(scenario())
+    card.executor.shutdown(wait=True)
+    alone, plain = _card()
+    plain.card.read_all()
+
+    assert bytes(data) == bytes(vc.memory[:1024])
+    assert vc.apdu_count == alone.apdu_count
+
+
+def test_cancelling_the_running_call_stops_it():
+    vc, card = _card()
+
+    async def scenario():
+        task = asyncio.ensure_future(card.read_all())
+        await asyncio.sleep(0.02)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+    card.executor.shutdown(wait=True)
+    assert vc.apdu_count < 1024 // 16
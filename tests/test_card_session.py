@@ -0,0 +1,125 @@
+from core.card_session import CardSession
+from core.virtual_card import VirtualCard
+from drivers.sle4442 import SLE4442
+
+
+class SwapSlot:
+    """A reader slot whose card can be exchanged between two calls."""
+
+    def __init__(self, card):
+        self.card = card
+
+    def __getattr__(self, name):
+        return getattr(self.card, name)
+
+
+class SwapReader:
+    def __init__(self, slot):
+        self.slot = slot
+
+    def createConnection(self):
+        return self.slot
+
+    def __str__(self):
+        return "Swap Reader"
+
+
+def _card(serial, psc):
+    memory = [0xFF] * 256
+    memory[0:4] = [0xA2, 0x13, 0x10, 0x91]
+    memory[13:17] = serial
+    return VirtualCard("SLE4442", memory=memory, psc=psc)
+
+
+def _session(first):
+    slot = SwapSlot(first)
+    session = CardSession(SwapReader(slot))
+    session.open()
+    card = session.attach(SLE4442(session.conn))
+    return slot, session, card
+
+
+def test_recover_replays_psc_on_the_same_card():
+    a = _card([1, 2, 3, 4], [0x11, 0x22, 0x33])
+    _, session, card = _session(a)
+    card.read_all()
+    card.authenticate([0x11, 0x22, 0x33])
+
+    assert session.recover()
+    assert card.is_authenticated
+
+
+def test_recover_never_replays_psc_on_a_swapped_card():
+    a = _card([1, 2, 3, 4], [0x11, 0x22, 0x33])
+    b = _card([5, 6, 7, 8], [0x44, 0x55, 0x66])
+    slot, session, card = _session(a)
+    card.read_all()
+    card.authenticate([0x11, 0x22, 0x33])
+    b.connect()
+    slot.card = b
+
+    assert not session.recover()
+    assert not card.is_authenticated
+    assert card.auth_psc is None
+    assert card._resume == {}
+    sm = card.read_security_memory()
+    assert sm[0] == 0x07
+
+
+def test_recover_without_known_header_does_not_replay():
+    a = _card([1, 2, 3, 4], [0x11, 0x22, 0x33])
+    _, session, card = _session(a)
+    card.authenticate([0x11, 0x22, 0x33])
+
+    assert not session.recover()
+    assert not card.is_authenticated
+
+
+def test_reopen_drops_protection_and_auth_of_the_previous_card():
+    a = _card([1, 2, 3, 4], [0x11, 0x22, 0x33])
+    b = _card([5, 6, 7, 8], [0x44, 0x55, 0x66])
+    slot, session, card = _session(a)
+    card.read_protection_memory()
+    card.authenticate([0x11, 0x22, 0x33])
+
+    session.close()
+    b.connect()
+    slot.card = b
+    session.open()
+
+    assert not session.cache.has("protection")
+    assert not card.is_authenticated
+    assert card.auth_psc is None
+
+
+def test_resume_point_saved_for_another_card_is_not_reused():
+    a = _card([1, 2, 3, 4], [0x11, 0x22, 0x33])
+    _, _, card = _session(a)
+    key = card._resume_key(card.size)
+    card.forget_card()
+    # An operation still running on the old card saves its point late.
+    card._save_resume("image", key, [0x00] * 32)
+
+    assert card.read_all()[:4] == [0xA2, 0x13, 0x10, 0x91]
+
+
+def _drops_security_after_verify(driver, kind):
+    vc = VirtualCard(kind, psc=[0x11, 0x22])
+    vc.connect()
+    card = driver(vc)
+    card.cache.put("security", [0xFF, 0x11, 0x22, 0x00])
+    try:
+        card.authenticate([0x33, 0x44])
+    except Exception:
+        pass
+    return not card.cache.has("security")
+
+
+def test_sle4428_verify_drops_cached_security():
+    from drivers.sle4428 import SLE4428
+    assert _drops_security_after_verify(SLE4428, "SLE4428")
+
+
+def test_sle5528_verify_drops_cached_security():
+    from drivers.sle5528 import SLE5528
+    assert _drops_security_after_verify(SLE5528, "SLE5528")
@@ -0,0 +1,30 @@
+from core.virtual_card import VirtualCard
+from drivers.sle4442 import SLE4442
+
+
+def _card(**kwargs):
+    vc = VirtualCard("SLE4442", **kwargs)
+    vc.connect()
+    card = SLE4442(vc)
+    card.max_retries = 0
+    saved = []
+    card.on_caps_changed = lambda c: saved.append(c.persistent_caps())
+    return vc, card, saved
+
+
+def test_transient_step_down_is_not_saved():
+    vc, card, saved = _card()
+    vc.inject_fault("sw", ins=0xB0, sw=(0x6F, 0x00), count=3)
+    assert bytes(card.read_range(0, 256)) == bytes(vc.memory[:256])
+
+    assert card.read_chunk < 255
+    assert card.persistent_caps()["read_chunk"] is None
+    assert all(caps["read_chunk"] is None for caps in saved)
+
+
+def test_length_step_down_is_saved():
+    vc, card, saved = _card(max_read=128)
+    assert bytes(card.read_range(0, 256)) == bytes(vc.memory[:256])
+
+    assert card.read_chunk == 128
+    assert saved and saved[-1]["read_chunk"] == 128
@@ -0,0 +1,70 @@
+import pytest
+
+from drivers.acr_commands import HID
+from drivers.reader_profiles import HID_PROFILE
+from drivers.sle4442 import SLE4442
+
+
+class HidConnection:
+    """Answers HID OMNIKEY VERIFY like the reader does: 9000 or 63 00."""
+
+    def __init__(self, psc):
+        self.psc = list(psc)
+        self.sent = []
+
+    def transmit(self, apdu):
+        self.sent.append(list(apdu))
+        if apdu[1] == HID.VERIFY:
+            return [], *((0x90, 0x00) if list(apdu[5:]) == self.psc else (0x63, 0x00))
+        return [], 0x6D, 0x00
+
+    def getATR(self):
+        return [0x3B, 0x04, 0xA2, 0x13, 0x10, 0x91]
+
+
+def _card(psc):
+    conn = HidConnection(psc)
+    card = SLE4442(conn)
+    card.set_profile(HID_PROFILE)
+    return conn, card
+
+
+def test_authenticate_with_hid_profile():
+    conn, card = _card([0x11, 0x22, 0x33])
+    card.authenticate([0x11, 0x22, 0x33])
+
+    assert card.is_authenticated
+    assert card.auth_psc == [0x11, 0x22, 0x33]
+    assert [a[1] for a in conn.sent] == [HID.VERIFY]
+
+
+def test_authenticate_with_hid_profile_rejects_a_wrong_psc():
+    _, card = _card([0x11, 0x22, 0x33])
+    with pytest.raises(Exception):
+        card.authenticate([0x44, 0x55, 0x66])
+    assert not card.is_authenticated
+
+
+class PscPrompt:
+
+    def __init__(self, psc):
+        self.psc = psc
+        self.saved = None
+
+    def ask_user_for_psc(self):
+        return self.psc
+
+    def save_psc(self, card, psc):
+        self.saved = psc
+
+    def show_error(self, msg):
+        raise AssertionError(msg)
+
+
+def test_ensure_authenticated_with_hid_profile():
+    _, card = _card([0x11, 0x22, 0x33])
+    main = PscPrompt([0x11, 0x22, 0x33])
+
+    assert card.ensure_authenticated(main)
+    assert card.is_authenticated
+    assert main.saved == [0x11, 0x22, 0x33]
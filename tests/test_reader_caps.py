@@ -0,0 +1,22 @@
+import json
+import threading
+
+from core.reader_caps import ReaderCapsCache
+
+
+def test_concurrent_updates_are_all_saved(tmp_path):
+    caps = ReaderCapsCache(str(tmp_path / "reader_caps.json"))
+
+    def learn(n):
+        caps.update(f"Reader {n}", [0x3B, n], read_chunk=16 + n)
+
+    threads = [threading.Thread(target=learn, args=(n,)) for n in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    with open(caps.path, encoding="utf-8") as f:
+        saved = json.load(f)
+    assert len(saved) == 16
+    assert ReaderCapsCache(caps.path).get("Reader 3", [0x3B, 3]) == {"read_chunk": 19}
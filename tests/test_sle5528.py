@@ -0,0 +1,103 @@
+import pytest
+
+from core.virtual_card import VirtualCard
+from drivers.acr_commands import build_3w_read9
+from drivers.sle5528 import SLE5528
+
+
+def _card():
+    vc = VirtualCard("SLE5528")
+    vc.connect()
+    card = SLE5528(vc)
+    card.bulk_read = False
+    card.coalesce_gap = 0
+    return vc, card
+
+
+def test_read_all_3wire_without_on_chunk():
+    vc, card = _card()
+    assert card.on_chunk is None
+    data = card.read_all()
+    assert bytes(data) == bytes(vc.memory[:card.size])
+    assert vc.apdu_count == card.size
+
+
+def test_read_all_3wire_streams_header_first():
+    vc, card = _card()
+    pieces = []
+    card.on_chunk = lambda addr, data: pieces.append((addr, len(data)))
+    card.read_all()
+    assert pieces[0] == (0, 30)
+    assert sum(n for _, n in pieces) == card.size
+
+
+def test_run_plan_never_rewinds():
+    from drivers.apdu_plan import compile_3w_read
+    _, card = _card()
+    plan = compile_3w_read("SLE5528", 0, 8)
+    _, done = card.run_plan(plan, 5, 2)
+    assert done == 0
+
+
+def test_bulk_read_survives_a_pulled_card():
+    vc = VirtualCard("SLE5528")
+    vc.connect()
+    card = SLE5528(vc)
+    vc.inject_fault("remove", ins=0xB0)
+    with pytest.raises(Exception):
+        card.read_all()
+    assert card.bulk_read
+
+    vc.insert()
+    vc.connect()
+    assert bytes(card.read_all()) == bytes(vc.memory[:card.size])
+
+def test_bulk_read_falls_back_on_unsupported_instruction():
+    vc = VirtualCard("SLE5528")
+    vc.connect()
+    card = SLE5528(vc)
+    vc.inject_fault("sw", ins=0xB0, sw=(0x6D, 0x00), count=1000)
+    assert bytes(card.read_all()) == bytes(vc.memory[:card.size])
+    assert not card.bulk_read
+
+
+def test_stats_rekey_only_the_3wire_pass_through():
+    _, card = _card()
+    write = card.profile.write(0x40, [0x04] * 8)
+    assert card._stats_ins(write) == 0xD0
+    assert card._stats_ins(build_3w_read9(0x40)) >> 8 == 0x70
+
+
+def _writer():
+    vc = VirtualCard("SLE5528")
+    vc.connect()
+    card = SLE5528(vc)
+    card.retry_backoff = 0
+    card.read_all()
+    card.authenticate([0xFF, 0xFF])
+    return vc, card
+
+
+def test_bulk_write_retries_a_transient_error():
+    vc, card = _writer()
+    vc.inject_fault("sw", ins=0xD0, sw=(0x6F, 0x00))
+    card.write_bytes(0x40, [1, 2, 3, 4])
+    assert card.bulk_write
+    assert list(vc.memory[0x40:0x44]) == [1, 2, 3, 4]
+
+
+def test_bulk_write_survives_a_pulled_card():
+    vc, card = _writer()
+    card.max_retries = 0
+    vc.inject_fault("remove", ins=0xD0)
+    with pytest.raises(Exception):
+        card.write_bytes(0x40, [1, 2, 3, 4])
+    assert card.bulk_write
+
+
+def test_bulk_write_falls_back_on_unsupported_instruction():
+    vc, card = _writer()
+    vc.inject_fault("sw", ins=0xD0, sw=(0x6D, 0x00), count=1000)
+    card.write_bytes(0x40, [1, 2, 3, 4])
+    assert not card.bulk_write
+    assert list(vc.memory[0x40:0x44]) == [1, 2, 3, 4]
@@ -0,0 +1,32 @@
+from core.virtual_card import VirtualCard
+from drivers.sle4428 import SLE4428
+from drivers.sle4442 import SLE4442
+
+
+def _card(driver, kind, psc):
+    vc = VirtualCard(kind, psc=psc)
+    vc.protected[5] = 1
+    vc.connect()
+    card = driver(vc)
+    card.authenticate(psc)
+    return vc, card
+
+
+def test_dry_run_reports_protected_byte_on_sle4442():
+    _, card = _card(SLE4442, "SLE4442", [0x11, 0x22, 0x33])
+    plan = card.write_changes([0x42] * 8, addr=0, dry_run=True)
+    assert 5 in plan.locked
+
+
+def test_write_changes_skips_protected_byte_on_sle4442():
+    vc, card = _card(SLE4442, "SLE4442", [0x11, 0x22, 0x33])
+    card.write_changes([0x42] * 8, addr=0)
+    assert vc.memory[5] == 0xFF
+    assert card.main_memory[5] == 0xFF
+    assert vc.memory[6] == 0x42
+
+
+def test_dry_run_reports_protected_byte_on_sle4428():
+    _, card = _card(SLE4428, "SLE4428", [0x11, 0x22])
+    plan = card.write_changes([0x42] * 8, addr=0, dry_run=True)
+    assert 5 in plan.locked